@@ -0,0 +1,198 @@
+"""活動ログのライトビハインド書き込み
+
+ビューはログをメモリ上のキューに積むだけで即座に応答し、バックグラウンドの
+フラッシュスレッドが一定間隔・一定件数ごとにまとめて1トランザクションで書き込む。
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ActivityCounter, StudentActivityLog
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogWriter:
+    """StudentActivityLog をバックグラウンドでまとめて書き込むキュー"""
+
+    def __init__(self, max_size, flush_interval, batch_size, enqueue_timeout):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.enqueue_timeout = enqueue_timeout
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._reset()
+        atexit.register(self.shutdown)
+
+    def _reset(self):
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def enqueue(self, entries):
+        """ログをキューに積む。満杯のまま待ち時間を超えた場合は False を返す"""
+        if not entries:
+            return True
+        self._ensure_started()
+
+        with self._condition:
+            # キューに空きができるまで待つ（バックプレッシャー）
+            has_room = self._condition.wait_for(
+                lambda: not self._pending or len(self._pending) + len(entries) <= self.max_size,
+                timeout=self.enqueue_timeout
+            )
+            if not has_room or self._stopping:
+                return False
+            self._pending.extend(entries)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify_all()
+        return True
+
+    def shutdown(self, timeout=10):
+        """フラッシュスレッドを止め、残っているログを全て書き込む"""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+        # スレッドが書き切れなかった分は呼び出し元スレッドで書き込む
+        while True:
+            batch = self._take_batch(wait=False)
+            if not batch:
+                break
+            self._write(batch)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # fork 後のワーカーでは親プロセスのキューとスレッドを引き継がない
+                self._reset()
+                self._pid = os.getpid()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='activity-log-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch(wait=True)
+            if batch:
+                self._write(batch)
+            elif self._stopping:
+                break
+
+    def _take_batch(self, wait):
+        with self._condition:
+            if wait and not self._stopping and len(self._pending) < self.batch_size:
+                self._condition.wait(self.flush_interval)
+            count = min(len(self._pending), self.batch_size)
+            batch = [self._pending.popleft() for _ in range(count)]
+            # 空きを待っている生産者を起こす
+            self._condition.notify_all()
+        return batch
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            with transaction.atomic():
+                StudentActivityLog.objects.bulk_create(batch)
+                increment_activity_counters(batch)
+        except Exception:
+            # 一括書き込みに失敗した場合は1件ずつ書き込み、不正な行だけを破棄する
+            logger.exception('活動ログの一括書き込みに失敗しました（%d件）', len(batch))
+            self._write_one_by_one(batch)
+        finally:
+            close_old_connections()
+
+    def _write_one_by_one(self, batch):
+        dropped = 0
+        for entry in batch:
+            try:
+                with transaction.atomic():
+                    entry.pk = None
+                    entry.save(force_insert=True)
+                    increment_activity_counters([entry])
+            except Exception:
+                dropped += 1
+        if dropped:
+            logger.error('活動ログ %d件を書き込めずに破棄しました', dropped)
+
+
+def increment_activity_counters(entries):
+    """書き込んだログの件数を (生徒, 文章, 活動タイプ) ごとのカウンターに F() で加算する"""
+    totals = {}
+    for entry in entries:
+        if not entry.text_id:
+            continue
+        key = (entry.student_id, int(entry.text_id), entry.activity_type)
+        count, last_activity_at = totals.get(key, (0, entry.timestamp))
+        totals[key] = (count + 1, max(last_activity_at, entry.timestamp))
+
+    for (student_id, text_id, activity_type), (count, last_activity_at) in totals.items():
+        counters = ActivityCounter.objects.filter(
+            text_id=text_id, student_id=student_id, activity_type=activity_type
+        )
+        # 他のプロセスが先に新しい時刻を書き込んでいても巻き戻さない（NULL は SQLite では最大値にならないため補う）
+        latest = Value(last_activity_at, output_field=DateTimeField())
+        changes = {
+            'count': F('count') + count,
+            'last_activity_at': Greatest(Coalesce('last_activity_at', latest), latest),
+        }
+        if counters.update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                ActivityCounter.objects.create(
+                    text_id=text_id,
+                    student_id=student_id,
+                    activity_type=activity_type,
+                    count=count,
+                    last_activity_at=last_activity_at
+                )
+        except IntegrityError:
+            # 他のプロセスが先に作成した場合は加算に切り替える
+            counters.update(**changes)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_activity_log_writer():
+    """設定値から生成したプロセス共有のライターを返す"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ActivityLogWriter(
+                    max_size=settings.ACTIVITY_LOG_QUEUE_SIZE,
+                    flush_interval=settings.ACTIVITY_LOG_FLUSH_INTERVAL,
+                    batch_size=settings.ACTIVITY_LOG_FLUSH_BATCH_SIZE,
+                    enqueue_timeout=settings.ACTIVITY_LOG_ENQUEUE_TIMEOUT,
+                )
+    return _writer
+
+
+def write_activity_logs(entries):
+    """活動ログを書き込む。ライトビハインド無効時は同期的に一括INSERTする"""
+    if not settings.ACTIVITY_LOG_WRITE_BEHIND:
+        with transaction.atomic():
+            StudentActivityLog.objects.bulk_create(entries)
+            increment_activity_counters(entries)
+        return True
+    return get_activity_log_writer().enqueue(entries)
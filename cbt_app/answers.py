@@ -0,0 +1,108 @@
+"""問題回答（QuestionResponse）の保存"""
+from django.db import transaction
+from django.utils import timezone
+
+from .exam_paper import get_exam_paper
+from .grading import grade_text
+from .models import QuestionResponse
+from .similarity import update_essay_signatures
+
+# 上書き保存する列（created_at は最初に保存した時刻のまま残す）
+UPSERT_FIELDS = ['response_text', 'selected_choice', 'confidence_level', 'response_time', 'updated_at']
+
+
+class AnswerError(ValueError):
+    """送信された回答の内容が不正な場合の例外"""
+
+
+def _build_response(session, question, answer, now):
+    selected_choice_id = answer.get('selected_choice_id')
+    if selected_choice_id in (None, ''):
+        selected_choice_id = None
+    else:
+        try:
+            selected_choice_id = int(selected_choice_id)
+        except (TypeError, ValueError):
+            raise AnswerError('selected_choice_id must be an integer')
+        if selected_choice_id not in {choice['id'] for choice in question['choices']}:
+            raise AnswerError(f"Choice {selected_choice_id} does not belong to question {question['id']}")
+
+    try:
+        confidence_level = int(answer.get('confidence_level', 3))
+    except (TypeError, ValueError):
+        raise AnswerError('confidence_level must be an integer')
+    if not 1 <= confidence_level <= 5:
+        raise AnswerError('confidence_level must be between 1 and 5')
+
+    return QuestionResponse(
+        session=session,
+        question_id=question['id'],
+        response_text=str(answer.get('response_text') or ''),
+        selected_choice_id=selected_choice_id,
+        confidence_level=confidence_level,
+        # 回答時間は解答フェーズの開始から最後に保存した時点までをサーバー側で計る
+        response_time=now - session.answering_start_time if session.answering_start_time else None,
+        updated_at=now
+    )
+
+
+def save_question_responses(session, answers, now=None):
+    """セッションの回答をまとめて保存する（INSERT ... ON CONFLICT DO UPDATE の1文）
+
+    answers は question_id, response_text, selected_choice_id, confidence_level を持つ辞書のリスト。
+    各回答は問題ごとの最新の状態全体を表し、既存の回答を置き換える。
+    採点と記述問題の類似検出用の署名は、内容が変わった回答についてだけコミット後に作り直す。
+    """
+    now = now or timezone.now()
+
+    # 同じ問題が複数回含まれる場合は最後のものを使う
+    latest = {}
+    for answer in answers:
+        try:
+            latest[int(answer['question_id'])] = answer
+        except (KeyError, TypeError, ValueError):
+            raise AnswerError('question_id is required for every answer')
+
+    questions = {question['id']: question for question in get_exam_paper(session.text_id)['questions']}
+    missing = set(latest) - set(questions)
+    if missing:
+        raise AnswerError(f"Questions {sorted(missing)} do not belong to this text")
+
+    responses = [
+        _build_response(session, questions[question_id], answer, now)
+        for question_id, answer in latest.items()
+    ]
+    # 保存前の選んだ選択肢と記述内容を読み、変わった回答を求める（確信度だけの自動保存では何もしない）
+    previous = {
+        question_id: (selected_choice_id, response_text)
+        for question_id, selected_choice_id, response_text in QuestionResponse.objects.filter(
+            session=session, question_id__in=list(latest)
+        ).values_list('question_id', 'selected_choice_id', 'response_text')
+    }
+    choice_changed = False
+    changed_essay_ids = []
+    for response in responses:
+        question_type = questions[response.question_id]['question_type']
+        selected_choice_id, response_text = previous.get(response.question_id, (None, None))
+        if question_type == 'choice' and response.selected_choice_id != selected_choice_id:
+            choice_changed = True
+        elif question_type == 'essay' and response.response_text != response_text:
+            changed_essay_ids.append(response.question_id)
+
+    QuestionResponse.objects.bulk_create(
+        responses,
+        update_conflicts=True,
+        unique_fields=['session', 'question'],
+        update_fields=UPSERT_FIELDS
+    )
+    if choice_changed:
+        # このセッションの得点だけを、回答がコミットされてから採点し直す
+        transaction.on_commit(lambda: grade_text(session.text_id, [session.id]))
+    if changed_essay_ids:
+        # 記述内容が変わった回答だけ、コミットされてから署名を作り直す
+        transaction.on_commit(lambda: update_essay_signatures(
+            QuestionResponse.objects.filter(session=session, question_id__in=changed_essay_ids).values_list(
+                'id', 'question_id', 'response_text'
+            )
+        ))
+    return responses
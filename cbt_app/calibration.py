@@ -0,0 +1,147 @@
+"""確信度の較正（キャリブレーション）と回答時間の集計
+
+文章の全ての回答を配列として読み込み、文章全体・生徒別・問題別に
+正答率、確信度別の正答数、過信度、ブライアスコア、回答時間のパーセンタイルを
+np.bincount でまとめて求め、CalibrationSummary に保存する。
+正誤は選択肢を選んだ選択問題の回答だけで、回答時間と確信度の平均は全ての回答で求める。
+集計結果は教員向けAPI（api/teacher/calibration/<id>/）だけで提供し、画面は持たない。
+"""
+import numpy as np
+from django.db import transaction
+
+from .models import CalibrationSummary, QuestionChoice, QuestionResponse
+
+CONFIDENCE_LEVELS = 5
+TIME_PERCENTILES = (25, 50, 75, 90)
+
+
+def _round(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+
+def group_percentiles(groups, values, group_count, percentiles=TIME_PERCENTILES):
+    """グループごとのパーセンタイル（線形補間、np.percentile と同じ）を (グループ数, パーセンタイル数) で返す
+
+    値が NaN の要素は除く。値のないグループは NaN になる。
+    """
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    order = np.lexsort((values, groups))
+    values = values[order]
+
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    has_values = counts > 0
+    starts, counts = starts[has_values], counts[has_values]
+
+    result = np.full((group_count, len(percentiles)), np.nan)
+    for column, percentile in enumerate(percentiles):
+        position = starts + (counts - 1) * percentile / 100
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        fraction = position - lower
+        result[has_values, column] = values[lower] * (1 - fraction) + values[upper] * fraction
+    return result
+
+
+def aggregate(groups, group_count, graded, correct, confidence, seconds):
+    """回答ごとの配列をグループごとの集計値の配列にする（groups は 0 〜 group_count-1 の番号）"""
+    def total(weights=None):
+        return np.bincount(groups, weights=weights, minlength=group_count)
+
+    graded = graded.astype(np.float64)
+    correct = correct.astype(np.float64) * graded
+    # 確信度 1〜5 を 0〜1 の主観的な正答確率とみなす
+    probability = (confidence - 1) / (CONFIDENCE_LEVELS - 1)
+
+    response_count = total()
+    graded_count = total(graded)
+    accuracy = _ratio(total(correct), graded_count)
+
+    # 確信度ごとの回答数・正答数（グループ × 確信度）
+    bins = groups * CONFIDENCE_LEVELS + (confidence - 1)
+    calibration_total = np.bincount(bins, weights=graded, minlength=group_count * CONFIDENCE_LEVELS)
+    calibration_correct = np.bincount(bins, weights=correct, minlength=group_count * CONFIDENCE_LEVELS)
+
+    return {
+        'response_count': response_count,
+        'graded_count': graded_count,
+        'accuracy': accuracy,
+        'mean_confidence': _ratio(total(confidence.astype(np.float64)), response_count),
+        'overconfidence': _ratio(total(probability * graded), graded_count) - accuracy,
+        'brier_score': _ratio(total((probability - correct) ** 2 * graded), graded_count),
+        'calibration': np.stack(
+            (
+                calibration_total.reshape(group_count, CONFIDENCE_LEVELS),
+                calibration_correct.reshape(group_count, CONFIDENCE_LEVELS)
+            ),
+            axis=2
+        ).astype(np.int64),
+        'times': group_percentiles(groups, seconds, group_count),
+    }
+
+
+def summarize_text(text_id):
+    """文章の回答を集計して CalibrationSummary を作り直す（作成した行数を返す）"""
+    rows = list(
+        QuestionResponse.objects.filter(session__text_id=text_id).values_list(
+            'session__student_id', 'question_id', 'question__question_type',
+            'selected_choice_id', 'confidence_level', 'response_time'
+        )
+    )
+    if not rows:
+        CalibrationSummary.objects.filter(text_id=text_id).delete()
+        return 0
+    correct_choice_ids = list(
+        QuestionChoice.objects.filter(question__text_id=text_id, is_correct=True).values_list('id', flat=True)
+    )
+
+    student_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    question_ids = np.array([row[1] for row in rows], dtype=np.int64)
+    selected = np.array([row[3] or 0 for row in rows], dtype=np.int64)
+    graded = np.array([row[2] == 'choice' for row in rows], dtype=bool) & (selected > 0)
+    correct = np.isin(selected, correct_choice_ids)
+    confidence = np.clip(np.array([row[4] for row in rows], dtype=np.int64), 1, CONFIDENCE_LEVELS)
+    seconds = np.array(
+        [row[5].total_seconds() if row[5] is not None else np.nan for row in rows],
+        dtype=np.float64
+    )
+
+    summaries = []
+    scopes = [
+        ('text', np.zeros(len(rows), dtype=np.int64)),
+        ('student', student_ids),
+        ('question', question_ids),
+    ]
+    for scope, keys in scopes:
+        unique_keys, groups = np.unique(keys, return_inverse=True)
+        stats = aggregate(groups, len(unique_keys), graded, correct, confidence, seconds)
+        for i, key in enumerate(unique_keys.tolist()):
+            summaries.append(CalibrationSummary(
+                text_id=text_id,
+                scope=scope,
+                student_id=key if scope == 'student' else None,
+                question_id=key if scope == 'question' else None,
+                response_count=int(stats['response_count'][i]),
+                graded_count=int(stats['graded_count'][i]),
+                accuracy=_round(stats['accuracy'][i]),
+                mean_confidence=_round(stats['mean_confidence'][i]),
+                overconfidence=_round(stats['overconfidence'][i]),
+                brier_score=_round(stats['brier_score'][i]),
+                calibration=stats['calibration'][i].tolist(),
+                time_p25=_round(stats['times'][i, 0]),
+                time_p50=_round(stats['times'][i, 1]),
+                time_p75=_round(stats['times'][i, 2]),
+                time_p90=_round(stats['times'][i, 3]),
+            ))
+
+    with transaction.atomic():
+        CalibrationSummary.objects.filter(text_id=text_id).delete()
+        CalibrationSummary.objects.bulk_create(summaries, batch_size=1000)
+    return len(summaries)
@@ -0,0 +1,95 @@
+"""文章ごとの問題冊子（問題と選択肢）のキャッシュ
+
+問題と選択肢は試験中は変わらないため、文章ごとに1回だけ読み込んで辞書に変換し、
+版トークン付きのキーでキャッシュする。Question / QuestionChoice の変更時は
+シグナルから版トークンを差し替えて無効化する。
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Question
+
+
+def _version_key(text_id):
+    return f'exam_paper_version:{text_id}'
+
+
+def _question_key(question_id):
+    return f'exam_question_text:{question_id}'
+
+
+def paper_version(text_id):
+    """問題冊子の現在の版（問題・選択肢の変更で差し替わる）"""
+    version = cache.get(_version_key(text_id))
+    if version is None:
+        # 他のリクエストが先に作成していればそちらを使う
+        cache.add(_version_key(text_id), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(text_id))
+    return version
+
+
+def _serialize_question(question):
+    # 生徒向けの表示に使うため、正答（is_correct）は含めない
+    return {
+        'id': question.id,
+        'order': question.order,
+        'question_text': question.question_text,
+        'question_type': question.question_type,
+        'question_type_display': question.get_question_type_display(),
+        'hide_text': question.hide_text,
+        'allow_notes_only': question.allow_notes_only,
+        'show_in_answering_phase': question.show_in_answering_phase,
+        'choices': [
+            {'id': choice.id, 'choice_text': choice.choice_text, 'order': choice.order}
+            for choice in sorted(question.choices.all(), key=lambda choice: (choice.order, choice.id))
+        ],
+    }
+
+
+def get_exam_paper(text_id):
+    """文章の問題冊子を返す（{'text_id', 'questions': [...]}、問題は order 順）"""
+    cache_key = f'exam_paper:{text_id}:{paper_version(text_id)}'
+    paper = cache.get(cache_key)
+    if paper is None:
+        questions = Question.objects.filter(text_id=text_id).order_by('order', 'id').prefetch_related('choices')
+        paper = {
+            'text_id': text_id,
+            'questions': [_serialize_question(question) for question in questions],
+        }
+        cache.set(cache_key, paper, settings.EXAM_PAPER_CACHE_TIMEOUT)
+        cache.set_many(
+            {_question_key(question['id']): text_id for question in paper['questions']},
+            settings.EXAM_PAPER_CACHE_TIMEOUT
+        )
+    return paper
+
+
+def get_question_text_id(question_id):
+    """問題が属する文章のIDを返す（存在しない問題は None）"""
+    text_id = cache.get(_question_key(question_id))
+    if text_id is None:
+        text_id = Question.objects.filter(id=question_id).values_list('text_id', flat=True).first()
+    return text_id
+
+
+def get_exam_question(question_id):
+    """問題冊子から問題を1問返す（存在しない問題は None）"""
+    text_id = get_question_text_id(question_id)
+    if text_id is None:
+        return None
+    for question in get_exam_paper(text_id)['questions']:
+        if question['id'] == question_id:
+            return question
+    return None
+
+
+def invalidate_exam_paper(text_id, question_id=None):
+    """コミット後に問題冊子の版を差し替える（コミット前の内容がキャッシュに残らないように）"""
+    def invalidate():
+        cache.set(_version_key(text_id), uuid.uuid4().hex, None)
+        if question_id is not None:
+            cache.delete(_question_key(question_id))
+    transaction.on_commit(invalidate)
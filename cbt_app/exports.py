@@ -0,0 +1,139 @@
+"""研究用データのストリーミングエクスポート
+
+サーバーサイドカーソル（iterator）で行を少しずつ読み出し、CSV または NDJSON に
+変換しながら送り出すため、行数に関係なく一定のメモリで動作する。
+ASGIでは同期イテレーターが送信前に全件リストにされるため、非同期ジェネレーターとして返し、
+データベースを読む同期の処理はチャンクごとにスレッドで進める。
+"""
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import QuestionResponse, StudentActivityLog, StudentAnnotation
+
+# 1回のフェッチで読み出す行数と、1回の送信にまとめる行数
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_ROWS_PER_WRITE = 500
+
+# 種類ごとの出力列（values_list のフィールド名）と絞り込みに使うフィールド
+EXPORTS = {
+    'activity-logs': {
+        'queryset': lambda: StudentActivityLog.objects.all(),
+        'fields': [
+            'id', 'student_id', 'student__username', 'text_id', 'question_id',
+            'activity_type', 'details', 'timestamp',
+        ],
+        'text_field': 'text_id',
+        'student_field': 'student_id',
+        'date_field': 'timestamp',
+    },
+    'responses': {
+        'queryset': lambda: QuestionResponse.objects.all(),
+        'fields': [
+            'id', 'session__student_id', 'session__student__username', 'session__text_id',
+            'question_id', 'selected_choice_id', 'response_text', 'confidence_level',
+            'response_time', 'created_at', 'updated_at',
+        ],
+        'text_field': 'session__text_id',
+        'student_field': 'session__student_id',
+        'date_field': 'created_at',
+    },
+    'annotations': {
+        'queryset': lambda: StudentAnnotation.objects.all(),
+        'fields': [
+            'id', 'student_id', 'student__username', 'text_id', 'annotation_type',
+            'start_position', 'end_position', 'content', 'created_at', 'updated_at',
+        ],
+        'text_field': 'text_id',
+        'student_field': 'student_id',
+        'date_field': 'created_at',
+    },
+}
+
+
+def build_export_queryset(kind, text_id=None, student_id=None, since=None, until=None):
+    """絞り込み条件を適用した values_list クエリセットを返す（until は当日を含まない境界）"""
+    export = EXPORTS[kind]
+    queryset = export['queryset']()
+    if text_id:
+        queryset = queryset.filter(**{export['text_field']: text_id})
+    if student_id:
+        queryset = queryset.filter(**{export['student_field']: student_id})
+    if since:
+        queryset = queryset.filter(**{f"{export['date_field']}__gte": since})
+    if until:
+        queryset = queryset.filter(**{f"{export['date_field']}__lt": until})
+    return queryset.order_by('id').values_list(*export['fields'])
+
+
+class _Echo:
+    """csv.writer の書き込み先として、書き込まれた文字列をそのまま返す"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if hasattr(value, 'total_seconds'):
+        return value.total_seconds()
+    return value
+
+
+async def _iterate_in_thread(chunks):
+    """同期のジェネレーターを1チャンクずつスレッドで進める非同期ジェネレーター
+
+    thread_sensitive（既定）のため、同じリクエストの間は常に同じスレッドとデータベース接続で
+    サーバーサイドカーソルを読み進める。
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+def _csv_chunks(kind, queryset):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(EXPORTS[kind]['fields'])
+
+    buffer = []
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        buffer.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(buffer) >= EXPORT_ROWS_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _ndjson_chunks(kind, queryset):
+    fields = EXPORTS[kind]['fields']
+
+    buffer = []
+    for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        buffer.append(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+        if len(buffer) >= EXPORT_ROWS_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv(kind, queryset):
+    """CSV をチャンク単位で生成する（Excel で開けるよう先頭に BOM を付ける）"""
+    return _iterate_in_thread(_csv_chunks(kind, queryset))
+
+
+def stream_ndjson(kind, queryset):
+    """1行1オブジェクトの JSON（NDJSON）をチャンク単位で生成する"""
+    return _iterate_in_thread(_ndjson_chunks(kind, queryset))
@@ -0,0 +1,125 @@
+"""選択問題の自動採点
+
+文章ごとの回答を「セッション × 問題」の行列（選択した選択肢ID、無回答は0）として読み込み、
+正答の選択肢IDとの照合をNumPyで一括して行う。結果は SessionScore に保存し、
+回答の保存時はそのセッションだけ、正答の変更時は文章全体を採点し直す。
+"""
+import threading
+
+import numpy as np
+from django.db import transaction
+
+from .models import Question, QuestionChoice, QuestionResponse, ReadingSession, SessionScore
+
+SCORE_FIELDS = ['question_count', 'answered_count', 'correct_count', 'score', 'updated_at']
+
+# コミット待ちの全体採点（スレッドごと。トランザクションはスレッドの接続ごとのため）
+_pending_regrades = threading.local()
+
+
+def build_response_matrix(session_ids, question_ids, responses):
+    """(session_id, question_id, selected_choice_id) の組から選択肢IDの行列を作る
+
+    session_ids と question_ids は昇順であること。
+    """
+    matrix = np.zeros((len(session_ids), len(question_ids)), dtype=np.int64)
+    rows = np.array(
+        [(session_id, question_id, choice_id or 0) for session_id, question_id, choice_id in responses],
+        dtype=np.int64
+    ).reshape(-1, 3)
+    if len(rows):
+        matrix[
+            np.searchsorted(session_ids, rows[:, 0]),
+            np.searchsorted(question_ids, rows[:, 1])
+        ] = rows[:, 2]
+    return matrix
+
+
+def score_matrix(matrix, correct_choice_ids):
+    """行列を正答の選択肢IDと照合し、セッションごとの (回答数, 正答数) を返す"""
+    answered = (matrix > 0).sum(axis=1)
+    correct = np.isin(matrix, correct_choice_ids).sum(axis=1)
+    return answered, correct
+
+
+def load_choice_matrix(text_id, session_ids=None):
+    """文章の選択問題の回答行列を読み込む
+
+    (セッションID, 問題ID, 正答の選択肢ID, 行列) を返す。IDの配列はいずれも昇順。
+    """
+    sessions = ReadingSession.objects.filter(text_id=text_id)
+    if session_ids is not None:
+        sessions = sessions.filter(id__in=session_ids)
+    session_ids = np.array(sessions.order_by('id').values_list('id', flat=True), dtype=np.int64)
+
+    question_ids = np.array(
+        Question.objects.filter(text_id=text_id, question_type='choice').order_by('id').values_list('id', flat=True),
+        dtype=np.int64
+    )
+    correct_choice_ids = np.array(
+        QuestionChoice.objects.filter(
+            question_id__in=question_ids.tolist(), is_correct=True
+        ).order_by('id').values_list('id', flat=True),
+        dtype=np.int64
+    )
+    responses = []
+    if len(session_ids) and len(question_ids):
+        responses = QuestionResponse.objects.filter(
+            session_id__in=session_ids.tolist(),
+            question_id__in=question_ids.tolist()
+        ).values_list('session_id', 'question_id', 'selected_choice_id')
+
+    matrix = build_response_matrix(session_ids, question_ids, responses)
+    return session_ids, question_ids, correct_choice_ids, matrix
+
+
+def grade_text(text_id, session_ids=None):
+    """文章の選択問題を採点して SessionScore に保存する（session_ids 指定時はそのセッションのみ）"""
+    session_ids, question_ids, correct_choice_ids, matrix = load_choice_matrix(text_id, session_ids)
+    if not len(session_ids):
+        return 0
+
+    answered, correct = score_matrix(matrix, correct_choice_ids)
+    question_count = len(question_ids)
+    scores = correct * 100.0 / question_count if question_count else None
+
+    SessionScore.objects.bulk_create(
+        [
+            SessionScore(
+                session_id=int(session_id),
+                question_count=question_count,
+                answered_count=int(answered[i]),
+                correct_count=int(correct[i]),
+                score=float(scores[i]) if scores is not None else None
+            )
+            for i, session_id in enumerate(session_ids)
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['session'],
+        update_fields=SCORE_FIELDS
+    )
+    return len(session_ids)
+
+
+def _pending_text_ids():
+    if not hasattr(_pending_regrades, 'text_ids'):
+        _pending_regrades.text_ids = set()
+    return _pending_regrades.text_ids
+
+
+def _flush_text_regrades():
+    """コミット待ちの文章をそれぞれ1回だけ採点し直す（同じコミットの2回目以降の呼び出しは何もしない）"""
+    text_ids = _pending_text_ids()
+    while text_ids:
+        grade_text(text_ids.pop())
+
+
+def schedule_text_regrade(text_id):
+    """正答や問題の変更後、コミットされてから文章全体を採点し直す
+
+    問題や選択肢を1つのトランザクションでまとめて保存しても、文章ごとに1回だけ採点する。
+    ロールバックで破棄された分は集合に残り、次にコミットされた時に採点される。
+    """
+    _pending_text_ids().add(text_id)
+    transaction.on_commit(_flush_text_regrades)
@@ -0,0 +1,78 @@
+"""クラス全体のハイライト分布（ヒートマップ）の集計"""
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import StudentAnnotation
+from .text_render import text_end_position
+
+HEATMAP_CACHE_TIMEOUT = 60 * 60
+
+
+def _highlight_version(highlights):
+    """最新の updated_at と件数から集計結果の版を作る（削除も件数の変化で検知する）"""
+    version = highlights.aggregate(latest=Max('updated_at'), count=Count('id'))
+    latest = version['latest'].timestamp() if version['latest'] else 0
+    return f"{latest}:{version['count']}"
+
+
+def compute_coverage(starts, ends, length):
+    """スイープラインで各文字位置を覆うハイライト数を求める"""
+    starts = np.clip(starts, 0, length)
+    ends = np.clip(ends, 0, length)
+    valid = starts < ends
+    starts, ends = starts[valid], ends[valid]
+
+    # 開始位置で +1、終了位置で -1 して累積和を取る
+    events = np.bincount(starts, minlength=length + 1) - np.bincount(ends, minlength=length + 1)
+    return np.cumsum(events[:length])
+
+
+def to_segments(coverage, bucket_size):
+    """被覆数を bucket_size 文字ごとの最大値にまとめ、値が変わる区間 [start, end, value] に圧縮する"""
+    if bucket_size > 1 and len(coverage):
+        padding = -len(coverage) % bucket_size
+        buckets = np.pad(coverage, (0, padding)).reshape(-1, bucket_size).max(axis=1)
+        coverage = np.repeat(buckets, bucket_size)[:len(coverage)]
+    if not len(coverage):
+        return []
+
+    boundaries = np.flatnonzero(np.diff(coverage)) + 1
+    segment_starts = np.concatenate(([0], boundaries))
+    segment_ends = np.concatenate((boundaries, [len(coverage)]))
+    values = coverage[segment_starts]
+    nonzero = values > 0
+    return np.column_stack((segment_starts[nonzero], segment_ends[nonzero], values[nonzero])).tolist()
+
+
+def highlight_heatmap(text, bucket_size=1):
+    """文章に対する全生徒のハイライト分布を返す（文章と最新の更新時刻をキーにキャッシュ）"""
+    highlights = StudentAnnotation.objects.filter(text=text, annotation_type='highlight')
+    # 位置はブラウザの文字位置（本文の前の空白を含む）で保存されているため、同じ座標で数える
+    length = text_end_position(text.content)
+    # 本文より大きい区切りは意味がなく、to_segments の np.pad が巨大な配列を作るため本文の長さで抑える
+    bucket_size = min(bucket_size, max(length, 1))
+    cache_key = f"highlight_heatmap:{text.id}:{length}:{bucket_size}:{_highlight_version(highlights)}"
+    heatmap = cache.get(cache_key)
+    if heatmap is not None:
+        return heatmap
+
+    rows = np.array(
+        list(highlights.values_list('start_position', 'end_position', 'student_id')),
+        dtype=np.int64
+    ).reshape(-1, 3)
+    starts, ends, students = rows[:, 0], rows[:, 1], rows[:, 2]
+
+    # 位置は生徒から送られた値のため、配列の大きさは本文の長さで決め、範囲外は切り詰める
+    coverage = compute_coverage(starts, ends, length)
+
+    heatmap = {
+        'length': length,
+        'bucket_size': bucket_size,
+        'max': int(coverage.max()) if len(coverage) else 0,
+        'highlight_count': len(rows),
+        'student_count': len(np.unique(students)),
+        'segments': to_segments(coverage, bucket_size),
+    }
+    cache.set(cache_key, heatmap, HEATMAP_CACHE_TIMEOUT)
+    return heatmap
@@ -0,0 +1,171 @@
+"""選択問題の項目分析（古典的テスト理論）
+
+採点と同じ「セッション × 問題」の回答行列から、問題ごとの困難度（正答率）と
+識別力（修正済み点双列相関、上位群と下位群の正答率の差）、選択肢ごとの選択率
+（全体・上位群・下位群）をNumPyでまとめて求める。結果は回答と問題冊子の版をキーにキャッシュする。
+"""
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .exam_paper import get_exam_paper, paper_version
+from .grading import load_choice_matrix
+from .models import QuestionResponse
+
+# 上位群・下位群とする受験者の割合（合計点の上位・下位27%）
+UPPER_LOWER_RATIO = 0.27
+# 正答の変更は他のプロセスの問題冊子の版に届かないため、短めに期限切れにする
+ITEM_ANALYSIS_CACHE_TIMEOUT = 5 * 60
+
+
+def _response_version(text_id):
+    """文章の回答の最新の updated_at と件数から分析結果の版を作る"""
+    version = QuestionResponse.objects.filter(session__text_id=text_id).aggregate(
+        latest=Max('updated_at'), count=Count('id')
+    )
+    latest = version['latest'].timestamp() if version['latest'] else 0
+    return f"{latest}:{version['count']}"
+
+
+def _rate(value):
+    """NumPyの値をJSON用の小数に変換する（計算できない値は None）"""
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+
+def _column_mean(values):
+    """列ごとの平均（行がなければ NaN）"""
+    if not len(values):
+        return np.full(values.shape[1], np.nan)
+    return values.mean(axis=0)
+
+
+def _group_rate(values, rows):
+    """指定した行の列ごとの平均"""
+    return _column_mean(values[rows])
+
+
+def point_biserial(correct, totals):
+    """各問題の正誤（0/1）と、その問題を除いた合計点との相関（修正済み点双列相関）"""
+    if len(correct) < 2:
+        return np.full(correct.shape[1], np.nan)
+    rest = totals[:, None] - correct
+    x = correct - correct.mean(axis=0)
+    y = rest - rest.mean(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (x * y).sum(axis=0) / np.sqrt((x ** 2).sum(axis=0) * (y ** 2).sum(axis=0))
+
+
+def upper_lower_groups(totals, ratio=UPPER_LOWER_RATIO):
+    """合計点の上位群と下位群の行番号を返す（群が重ならないよう最大で半数ずつ）"""
+    size = min(max(1, int(round(len(totals) * ratio))), len(totals) // 2)
+    order = np.argsort(totals, kind='stable')
+    return order[len(order) - size:], order[:size]
+
+
+def kr20(correct):
+    """KR-20による信頼性係数（受験者が2人未満か合計点の分散が0の場合は NaN）"""
+    k = correct.shape[1]
+    if k < 2 or len(correct) < 2:
+        return np.nan
+    p = correct.mean(axis=0)
+    variance = correct.sum(axis=1).var()
+    if variance == 0:
+        return np.nan
+    return k / (k - 1) * (1 - (p * (1 - p)).sum() / variance)
+
+
+def analyze_matrix(matrix, correct_choice_ids, choice_ids, choice_columns):
+    """回答行列から問題ごと・選択肢ごとの統計量を配列で求める
+
+    choice_ids は分析する選択肢のID、choice_columns はそれぞれが属する問題の列番号。
+    """
+    correct = np.isin(matrix, correct_choice_ids).astype(np.float64)
+    totals = correct.sum(axis=1)
+    upper, lower = upper_lower_groups(totals)
+
+    # 選択肢ごとに「その選択肢を選んだか」の行列（受験者 × 選択肢）を作る
+    selected = (matrix[:, choice_columns] == choice_ids).astype(np.float64)
+
+    return {
+        'totals': totals,
+        'difficulty': _column_mean(correct),
+        'omit_rate': _column_mean((matrix == 0).astype(np.float64)),
+        'point_biserial': point_biserial(correct, totals),
+        'upper_correct_rate': _group_rate(correct, upper),
+        'lower_correct_rate': _group_rate(correct, lower),
+        'choice_count': selected.sum(axis=0),
+        'choice_rate': _column_mean(selected),
+        'choice_upper_rate': _group_rate(selected, upper),
+        'choice_lower_rate': _group_rate(selected, lower),
+        'group_size': len(upper),
+        'kr20': kr20(correct),
+    }
+
+
+def item_analysis(text_id):
+    """文章の選択問題の項目分析を返す（回答と問題冊子の版をキーにキャッシュ）"""
+    cache_key = f'item_analysis:{text_id}:{paper_version(text_id)}:{_response_version(text_id)}'
+    report = cache.get(cache_key)
+    if report is not None:
+        return report
+
+    _, question_ids, correct_choice_ids, matrix = load_choice_matrix(text_id)
+    # 選択問題に1問も回答していないセッションは受験者に含めない
+    matrix = matrix[(matrix > 0).any(axis=1)]
+
+    columns = {int(question_id): column for column, question_id in enumerate(question_ids)}
+    questions = [question for question in get_exam_paper(text_id)['questions'] if question['id'] in columns]
+    choices = [(question, choice) for question in questions for choice in question['choices']]
+    choice_ids = np.array([choice['id'] for _, choice in choices], dtype=np.int64)
+    choice_columns = np.array([columns[question['id']] for question, _ in choices], dtype=np.int64)
+
+    stats = analyze_matrix(matrix, correct_choice_ids, choice_ids, choice_columns)
+    correct_ids = set(correct_choice_ids.tolist())
+
+    items = []
+    choice_index = 0
+    for question in questions:
+        column = columns[question['id']]
+        item_choices = []
+        for choice in question['choices']:
+            item_choices.append({
+                'choice_id': choice['id'],
+                'choice_text': choice['choice_text'],
+                'order': choice['order'],
+                'is_correct': choice['id'] in correct_ids,
+                'count': int(stats['choice_count'][choice_index]),
+                'rate': _rate(stats['choice_rate'][choice_index]),
+                'upper_rate': _rate(stats['choice_upper_rate'][choice_index]),
+                'lower_rate': _rate(stats['choice_lower_rate'][choice_index]),
+            })
+            choice_index += 1
+
+        upper_rate = stats['upper_correct_rate'][column]
+        lower_rate = stats['lower_correct_rate'][column]
+        items.append({
+            'question_id': question['id'],
+            'order': question['order'],
+            'question_text': question['question_text'],
+            'difficulty': _rate(stats['difficulty'][column]),
+            'discrimination': _rate(upper_rate - lower_rate),
+            'point_biserial': _rate(stats['point_biserial'][column]),
+            'upper_correct_rate': _rate(upper_rate),
+            'lower_correct_rate': _rate(lower_rate),
+            'omit_rate': _rate(stats['omit_rate'][column]),
+            'choices': item_choices,
+        })
+
+    totals = stats['totals']
+    report = {
+        'text_id': text_id,
+        'examinee_count': len(matrix),
+        'question_count': len(questions),
+        'group_size': stats['group_size'],
+        'mean_correct': _rate(totals.mean()) if len(totals) else None,
+        'sd_correct': _rate(totals.std()) if len(totals) else None,
+        'kr20': _rate(stats['kr20']),
+        'items': items,
+    }
+    cache.set(cache_key, report, ITEM_ANALYSIS_CACHE_TIMEOUT)
+    return report
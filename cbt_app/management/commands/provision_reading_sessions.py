@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cbt_app.models import Text
+from cbt_app.provisioning import provision_reading_sessions
+
+
+class Command(BaseCommand):
+    help = '文章を公開する前に、生徒全員（または指定した生徒）の読解セッションをまとめて作成します。'
+
+    def add_arguments(self, parser):
+        parser.add_argument('text_id', type=int, help='対象の文章ID')
+        parser.add_argument('--student', type=int, action='append', dest='students',
+                            help='対象の生徒ID（複数指定可。省略時は全ての生徒）')
+
+    def handle(self, *args, **options):
+        try:
+            text = Text.objects.get(id=options['text_id'])
+        except Text.DoesNotExist:
+            raise CommandError(f"文章ID {options['text_id']} が見つかりません")
+
+        created = provision_reading_sessions(text, options['students'])
+        self.stdout.write(self.style.SUCCESS(f'「{text.title}」の読解セッションを {created}件 作成しました'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from cbt_app.models import ActivityCounter, ActivityDailyRollup, StudentActivityLog
+
+
+class Command(BaseCommand):
+    help = (
+        '活動カウンターを生ログから作り直します。保持期間により削除済みの日は'
+        '日次集計テーブルの件数で補います。書き込みの少ない時間帯に実行してください。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--text', type=int, help='対象の文章ID（省略時は全ての文章）')
+
+    def handle(self, *args, **options):
+        logs = StudentActivityLog.objects.filter(text__isnull=False)
+        rollups = ActivityDailyRollup.objects.filter(text__isnull=False)
+        counters = ActivityCounter.objects.all()
+        if options['text']:
+            logs = logs.filter(text_id=options['text'])
+            rollups = rollups.filter(text_id=options['text'])
+            counters = counters.filter(text_id=options['text'])
+
+        totals = {}
+
+        # 生ログが残っていない日（削除済み）の件数は日次集計から取る
+        oldest = logs.aggregate(oldest=Min('timestamp'))['oldest']
+        if oldest is not None:
+            rollups = rollups.filter(day__lt=timezone.localdate(oldest))
+        for row in rollups.values('student_id', 'text_id', 'activity_type').annotate(total=Sum('count')).order_by():
+            totals[(row['student_id'], row['text_id'], row['activity_type'])] = [row['total'], None]
+
+        for row in logs.values('student_id', 'text_id', 'activity_type').annotate(
+            total=Count('id'), last_activity_at=Max('timestamp')
+        ).order_by():
+            key = (row['student_id'], row['text_id'], row['activity_type'])
+            total = totals.setdefault(key, [0, None])
+            total[0] += row['total']
+            total[1] = row['last_activity_at']
+
+        with transaction.atomic():
+            counters.delete()
+            ActivityCounter.objects.bulk_create([
+                ActivityCounter(
+                    student_id=student_id,
+                    text_id=text_id,
+                    activity_type=activity_type,
+                    count=count,
+                    last_activity_at=last_activity_at
+                )
+                for (student_id, text_id, activity_type), (count, last_activity_at) in totals.items()
+            ], batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'活動カウンターを {len(totals)}件 作り直しました'))
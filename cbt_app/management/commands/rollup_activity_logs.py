@@ -0,0 +1,117 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from cbt_app.models import ActivityDailyRollup, StudentActivityLog
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rollup_days(start_day, end_day):
+    """start_day 以上 end_day 未満の日の集計を生ログから作り直す（冪等）"""
+    rows = (
+        StudentActivityLog.objects
+        .filter(timestamp__gte=_start_of_day(start_day), timestamp__lt=_start_of_day(end_day))
+        .annotate(day=TruncDate('timestamp'))
+        .values('student_id', 'text_id', 'activity_type', 'day')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    rollups = [ActivityDailyRollup(**row) for row in rows]
+
+    with transaction.atomic():
+        ActivityDailyRollup.objects.filter(day__gte=start_day, day__lt=end_day).delete()
+        ActivityDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def unrolled_days(cutoff):
+    """cutoff より古い生ログが残っている日のうち、まだ集計行がない日を古い順に返す
+
+    集計済みの日は削除が途中で止まって生ログが一部しか残っていない可能性があるため、集計し直さない。
+    """
+    days = set(
+        StudentActivityLog.objects
+        .filter(timestamp__lt=cutoff)
+        .annotate(day=TruncDate('timestamp'))
+        .values_list('day', flat=True)
+        .order_by()
+        .distinct()
+    )
+    rolled = set(
+        ActivityDailyRollup.objects.filter(day__in=days).values_list('day', flat=True).distinct()
+    ) if days else set()
+    return sorted(days - rolled)
+
+
+def prune_activity_logs(cutoff, chunk_size):
+    """cutoff より古い生ログを古い順に chunk_size 件ずつ削除する"""
+    deleted = 0
+    while True:
+        ids = list(
+            StudentActivityLog.objects
+            .filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        StudentActivityLog.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+
+
+class Command(BaseCommand):
+    help = (
+        '生徒活動ログを (生徒, 文章, 活動タイプ, 日) ごとの件数に日次集計し、'
+        '--prune 指定時は保持期間を過ぎた生ログを削除します。定期実行を想定しています。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=2,
+            help='集計し直す日数（今日を含む。既定: 2）'
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='ACTIVITY_LOG_RETENTION_DAYS より古い生ログを削除する'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='削除1回あたりの件数（既定: 5000）'
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        tomorrow = today + timedelta(days=1)
+        start_day = today - timedelta(days=max(options['days'], 1) - 1)
+
+        retention_days = settings.ACTIVITY_LOG_RETENTION_DAYS
+        cutoff_day = today - timedelta(days=retention_days) if retention_days > 0 else None
+        if cutoff_day is not None:
+            # 生ログが削除済みの日は集計し直せないので保持期間内に限定する
+            start_day = max(start_day, cutoff_day)
+
+        count = rollup_days(start_day, tomorrow)
+        self.stdout.write(f'{start_day} 〜 {today} を集計しました（{count}行）')
+
+        if not options['prune']:
+            return
+        if cutoff_day is None:
+            self.stdout.write('ACTIVITY_LOG_RETENTION_DAYS が 0 のため削除は行いません')
+            return
+
+        # 削除する日のうち未集計の日は直前に集計しておく（未集計のまま失われないように）。
+        # 集計済みの日は、前回の削除が途中で止まった残りから集計し直すと件数が減るため触らない
+        for day in unrolled_days(_start_of_day(cutoff_day)):
+            count = rollup_days(day, day + timedelta(days=1))
+            self.stdout.write(f'{day} を集計しました（{count}行）')
+
+        deleted = prune_activity_logs(_start_of_day(cutoff_day), options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'{cutoff_day} より前の生ログを {deleted}件 削除しました'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cbt_app.calibration import summarize_text
+from cbt_app.models import QuestionResponse, Text
+
+
+class Command(BaseCommand):
+    help = (
+        '回答の確信度と正誤、回答時間を文章全体・生徒別・問題別に集計し、'
+        '確信度・回答時間の集計テーブルを作り直します。定期実行を想定しています。'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('text_ids', type=int, nargs='*',
+                            help='対象の文章ID（省略時は回答のある全ての文章）')
+
+    def handle(self, *args, **options):
+        text_ids = options['text_ids']
+        if text_ids:
+            missing = set(text_ids) - set(Text.objects.filter(id__in=text_ids).values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"文章ID {sorted(missing)} が見つかりません")
+        else:
+            text_ids = QuestionResponse.objects.values_list('session__text_id', flat=True).distinct().order_by('session__text_id')
+
+        for text_id in text_ids:
+            count = summarize_text(text_id)
+            self.stdout.write(f'文章ID {text_id} を集計しました（{count}行）')
+        self.stdout.write(self.style.SUCCESS('集計が完了しました'))
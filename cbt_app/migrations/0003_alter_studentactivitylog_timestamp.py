@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0002_alter_userprofile_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentactivitylog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cbt_app', '0003_alter_studentactivitylog_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(max_length=50, verbose_name='活動タイプ')),
+                ('day', models.DateField(verbose_name='日付')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='件数')),
+            ],
+            options={
+                'verbose_name': '活動ログ日次集計',
+                'verbose_name_plural': '活動ログ日次集計',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='studentactivitylog',
+            index=models.Index(fields=['timestamp'], name='cbt_app_stu_timesta_963e21_idx'),
+        ),
+        migrations.AddField(
+            model_name='activitydailyrollup',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='生徒'),
+        ),
+        migrations.AddField(
+            model_name='activitydailyrollup',
+            name='text',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='cbt_app.text', verbose_name='対象文章'),
+        ),
+        migrations.AddIndex(
+            model_name='activitydailyrollup',
+            index=models.Index(fields=['text', 'day'], name='cbt_app_act_text_id_d46f4a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitydailyrollup',
+            index=models.Index(fields=['day'], name='cbt_app_act_day_f6cfc0_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='activitydailyrollup',
+            unique_together={('student', 'text', 'activity_type', 'day')},
+        ),
+    ]
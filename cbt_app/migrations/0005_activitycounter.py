@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cbt_app', '0004_activitydailyrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(max_length=50, verbose_name='活動タイプ')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='件数')),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True, verbose_name='最終活動時刻')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='生徒')),
+                ('text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cbt_app.text', verbose_name='対象文章')),
+            ],
+            options={
+                'verbose_name': '活動カウンター',
+                'verbose_name_plural': '活動カウンター',
+                'unique_together': {('text', 'student', 'activity_type')},
+            },
+        ),
+    ]
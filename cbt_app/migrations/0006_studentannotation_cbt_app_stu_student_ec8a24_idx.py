@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0005_activitycounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentannotation',
+            index=models.Index(fields=['student', 'text', 'start_position', 'end_position'], name='cbt_app_stu_student_ec8a24_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0006_studentannotation_cbt_app_stu_student_ec8a24_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentannotation',
+            index=models.Index(fields=['text', 'annotation_type', 'updated_at'], name='cbt_app_stu_text_id_23e998_idx'),
+        ),
+    ]
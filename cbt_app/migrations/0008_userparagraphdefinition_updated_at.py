@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0007_studentannotation_cbt_app_stu_text_id_23e998_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userparagraphdefinition',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0008_userparagraphdefinition_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionresponse',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
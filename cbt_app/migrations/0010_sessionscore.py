@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0009_questionresponse_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_count', models.PositiveIntegerField(default=0, verbose_name='採点対象の問題数')),
+                ('answered_count', models.PositiveIntegerField(default=0, verbose_name='回答済みの問題数')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='正答数')),
+                ('score', models.FloatField(blank=True, null=True, verbose_name='得点（100点満点）')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='score', to='cbt_app.readingsession', verbose_name='セッション')),
+            ],
+            options={
+                'verbose_name': '採点結果',
+                'verbose_name_plural': '採点結果',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0010_sessionscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EssaySignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature', models.BinaryField(blank=True, verbose_name='MinHash署名')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cbt_app.question', verbose_name='問題')),
+                ('response', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='essay_signature', to='cbt_app.questionresponse', verbose_name='回答')),
+            ],
+            options={
+                'verbose_name': '記述回答の署名',
+                'verbose_name_plural': '記述回答の署名',
+            },
+        ),
+    ]
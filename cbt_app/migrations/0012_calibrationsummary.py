@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cbt_app', '0011_essaysignature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalibrationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('text', '文章全体'), ('student', '生徒別'), ('question', '問題別')], max_length=10, verbose_name='集計単位')),
+                ('response_count', models.PositiveIntegerField(default=0, verbose_name='回答数')),
+                ('graded_count', models.PositiveIntegerField(default=0, verbose_name='正誤のある回答数')),
+                ('accuracy', models.FloatField(blank=True, null=True, verbose_name='正答率')),
+                ('mean_confidence', models.FloatField(blank=True, null=True, verbose_name='平均確信度')),
+                ('overconfidence', models.FloatField(blank=True, null=True, verbose_name='過信度')),
+                ('brier_score', models.FloatField(blank=True, null=True, verbose_name='ブライアスコア')),
+                ('calibration', models.JSONField(default=list, verbose_name='確信度別の正答数')),
+                ('time_p25', models.FloatField(blank=True, null=True, verbose_name='回答時間（25パーセンタイル、秒）')),
+                ('time_p50', models.FloatField(blank=True, null=True, verbose_name='回答時間（中央値、秒）')),
+                ('time_p75', models.FloatField(blank=True, null=True, verbose_name='回答時間（75パーセンタイル、秒）')),
+                ('time_p90', models.FloatField(blank=True, null=True, verbose_name='回答時間（90パーセンタイル、秒）')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='cbt_app.question', verbose_name='問題')),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='生徒')),
+                ('text', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cbt_app.text', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '確信度・回答時間の集計',
+                'verbose_name_plural': '確信度・回答時間の集計',
+                'indexes': [models.Index(fields=['text', 'scope'], name='cbt_app_cal_text_id_45a55c_idx')],
+            },
+        ),
+    ]
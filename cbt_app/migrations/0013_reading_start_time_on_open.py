@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbt_app', '0012_calibrationsummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='readingsession',
+            name='reading_start_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='読解開始時刻'),
+        ),
+    ]
@@ -104,6 +104,12 @@ class StudentAnnotation(models.Model):
     class Meta:
         verbose_name = "生徒注釈"
         verbose_name_plural = "生徒注釈"
+        indexes = [
+            # 範囲指定での取得（start_position < end かつ end_position > start）を索引範囲走査にする
+            models.Index(fields=['student', 'text', 'start_position', 'end_position']),
+            # クラス全体のハイライト集計（文章・種類で絞り込み、最新の更新時刻を見る）
+            models.Index(fields=['text', 'annotation_type', 'updated_at']),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.annotation_type} - {self.text.title}"
@@ -114,15 +120,55 @@ class StudentActivityLog(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, blank=True, verbose_name="対象問題")
     activity_type = models.CharField(max_length=50, verbose_name="活動タイプ")
     details = models.JSONField(default=dict, verbose_name="詳細情報")
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # ライトビハインド書き込みでは受信時刻を保持するため auto_now_add ではなく default を使う
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         verbose_name = "生徒活動ログ"
         verbose_name_plural = "生徒活動ログ"
+        indexes = [
+            # 日次集計と保持期間による削除は時刻の範囲で走査する
+            models.Index(fields=['timestamp']),
+        ]
     
     def __str__(self):
         return f"{self.student.username} - {self.activity_type} - {self.timestamp}"
 
+class ActivityDailyRollup(models.Model):
+    student = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="生徒")
+    text = models.ForeignKey(Text, on_delete=models.CASCADE, null=True, blank=True, verbose_name="対象文章")
+    activity_type = models.CharField(max_length=50, verbose_name="活動タイプ")
+    day = models.DateField(verbose_name="日付")
+    count = models.PositiveIntegerField(default=0, verbose_name="件数")
+    
+    class Meta:
+        verbose_name = "活動ログ日次集計"
+        verbose_name_plural = "活動ログ日次集計"
+        unique_together = ['student', 'text', 'activity_type', 'day']
+        indexes = [
+            models.Index(fields=['text', 'day']),
+            models.Index(fields=['day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.username} - {self.activity_type} - {self.day} - {self.count}件"
+
+class ActivityCounter(models.Model):
+    student = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="生徒")
+    text = models.ForeignKey(Text, on_delete=models.CASCADE, verbose_name="対象文章")
+    activity_type = models.CharField(max_length=50, verbose_name="活動タイプ")
+    count = models.PositiveIntegerField(default=0, verbose_name="件数")
+    last_activity_at = models.DateTimeField(null=True, blank=True, verbose_name="最終活動時刻")
+    
+    class Meta:
+        verbose_name = "活動カウンター"
+        verbose_name_plural = "活動カウンター"
+        # 教員画面は文章単位で読むため text を先頭にする
+        unique_together = ['text', 'student', 'activity_type']
+    
+    def __str__(self):
+        return f"{self.student.username} - {self.text.title} - {self.activity_type}: {self.count}"
+
 class ParagraphSummary(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="生徒")
     text = models.ForeignKey(Text, on_delete=models.CASCADE, verbose_name="対象文章")
@@ -221,6 +267,7 @@ class UserParagraphDefinition(models.Model):
     start_offset = models.IntegerField(verbose_name="開始位置")
     end_offset = models.IntegerField(verbose_name="終了位置")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "ユーザー定義段落"
@@ -231,6 +278,31 @@ class UserParagraphDefinition(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.text.title} - 段落{self.paragraph_number}"
 
+# 読解セッションのフェーズ移行：移行先 → (移行元のフェーズ, 移行時刻を記録するフィールド)
+PHASE_TRANSITIONS = {
+    'answering': ('reading', ('reading_end_time', 'answering_start_time')),
+    'reading': ('answering', ('answering_end_time',)),
+}
+
+class ReadingSessionQuerySet(models.QuerySet):
+    def transition(self, phase, now=None):
+        """移行元のフェーズにあるセッションだけを1回の条件付きUPDATEで移行し、更新件数を返す
+        
+        既に移行済みのセッションは対象外になるため、繰り返し呼んでも時刻は上書きされない。
+        """
+        if phase not in PHASE_TRANSITIONS:
+            raise ValueError(f"phase must be one of {', '.join(PHASE_TRANSITIONS)}")
+        from_phase, time_fields = PHASE_TRANSITIONS[phase]
+        now = now or timezone.now()
+        return self.filter(current_phase=from_phase).update(
+            current_phase=phase,
+            **{field: now for field in time_fields}
+        )
+
+    def start_reading(self, now=None):
+        """読解開始時刻が未記録のセッションだけに開始時刻を記録し、更新件数を返す"""
+        return self.filter(reading_start_time__isnull=True).update(reading_start_time=now or timezone.now())
+
 class ReadingSession(models.Model):
     PHASE_CHOICES = [
         ('reading', '読解フェーズ'),
@@ -241,11 +313,14 @@ class ReadingSession(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="生徒")
     text = models.ForeignKey(Text, on_delete=models.CASCADE, verbose_name="対象文章")
     current_phase = models.CharField(max_length=20, choices=PHASE_CHOICES, default='reading', verbose_name="現在のフェーズ")
-    reading_start_time = models.DateTimeField(auto_now_add=True, verbose_name="読解開始時刻")
+    # 事前に作成したセッションは、生徒が文章を初めて開いた時点で記録する
+    reading_start_time = models.DateTimeField(null=True, blank=True, verbose_name="読解開始時刻")
     reading_end_time = models.DateTimeField(null=True, blank=True, verbose_name="読解終了時刻")
     answering_start_time = models.DateTimeField(null=True, blank=True, verbose_name="解答開始時刻")
     answering_end_time = models.DateTimeField(null=True, blank=True, verbose_name="解答終了時刻")
     
+    objects = ReadingSessionQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "読解セッション"
         verbose_name_plural = "読解セッション"
@@ -262,6 +337,7 @@ class QuestionResponse(models.Model):
     confidence_level = models.IntegerField(default=3, verbose_name="確信度（1-5）")
     response_time = models.DurationField(null=True, blank=True, verbose_name="回答時間")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "問題回答"
@@ -270,3 +346,65 @@ class QuestionResponse(models.Model):
     
     def __str__(self):
         return f"{self.session.student.username} - {self.question} - {self.created_at}"
+
+class EssaySignature(models.Model):
+    response = models.OneToOneField(QuestionResponse, on_delete=models.CASCADE, related_name='essay_signature', verbose_name="回答")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, verbose_name="問題")
+    signature = models.BinaryField(blank=True, verbose_name="MinHash署名")  # 短すぎる回答は空
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "記述回答の署名"
+        verbose_name_plural = "記述回答の署名"
+    
+    def __str__(self):
+        return f"{self.response} - {len(self.signature)} bytes"
+
+class SessionScore(models.Model):
+    session = models.OneToOneField(ReadingSession, on_delete=models.CASCADE, related_name='score', verbose_name="セッション")
+    question_count = models.PositiveIntegerField(default=0, verbose_name="採点対象の問題数")
+    answered_count = models.PositiveIntegerField(default=0, verbose_name="回答済みの問題数")
+    correct_count = models.PositiveIntegerField(default=0, verbose_name="正答数")
+    score = models.FloatField(null=True, blank=True, verbose_name="得点（100点満点）")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "採点結果"
+        verbose_name_plural = "採点結果"
+    
+    def __str__(self):
+        return f"{self.session} - {self.correct_count}/{self.question_count}"
+
+class CalibrationSummary(models.Model):
+    SCOPES = [
+        ('text', '文章全体'),
+        ('student', '生徒別'),
+        ('question', '問題別'),
+    ]
+    
+    text = models.ForeignKey(Text, on_delete=models.CASCADE, verbose_name="文章")
+    scope = models.CharField(max_length=10, choices=SCOPES, verbose_name="集計単位")
+    student = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name="生徒")
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, blank=True, verbose_name="問題")
+    response_count = models.PositiveIntegerField(default=0, verbose_name="回答数")
+    graded_count = models.PositiveIntegerField(default=0, verbose_name="正誤のある回答数")
+    accuracy = models.FloatField(null=True, blank=True, verbose_name="正答率")
+    mean_confidence = models.FloatField(null=True, blank=True, verbose_name="平均確信度")
+    overconfidence = models.FloatField(null=True, blank=True, verbose_name="過信度")  # 確信度（0〜1に換算）の平均 − 正答率
+    brier_score = models.FloatField(null=True, blank=True, verbose_name="ブライアスコア")
+    calibration = models.JSONField(default=list, verbose_name="確信度別の正答数")  # 確信度1〜5ごとの [回答数, 正答数]
+    time_p25 = models.FloatField(null=True, blank=True, verbose_name="回答時間（25パーセンタイル、秒）")
+    time_p50 = models.FloatField(null=True, blank=True, verbose_name="回答時間（中央値、秒）")
+    time_p75 = models.FloatField(null=True, blank=True, verbose_name="回答時間（75パーセンタイル、秒）")
+    time_p90 = models.FloatField(null=True, blank=True, verbose_name="回答時間（90パーセンタイル、秒）")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "確信度・回答時間の集計"
+        verbose_name_plural = "確信度・回答時間の集計"
+        indexes = [
+            models.Index(fields=['text', 'scope']),
+        ]
+    
+    def __str__(self):
+        return f"{self.text.title} - {self.get_scope_display()}"
@@ -0,0 +1,56 @@
+"""フェーズ変更のプロセス内配信（pub/sub）
+
+教員がフェーズを一括変更すると、同じプロセスで接続中の生徒のSSEストリームに
+イベントを配る。購読側はイベントループ上の asyncio.Queue で待ち、配信側は
+同期ビュー（別スレッド）から call_soon_threadsafe でキューに渡す。
+他のプロセスへは届かないため、SSEビュー側でも定期的にデータベースを確認する。
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+# 購読者ごとに保持するイベント数の上限（読み出しが追いつかない接続の分は捨てる）
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def _put(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+class PhaseEventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(dict)  # 文章ID → {キュー: イベントループ}
+
+    def subscribe(self, text_id):
+        """イベントループ上で呼び出し、イベントを受け取るキューを返す"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[text_id][queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, text_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(text_id)
+            if subscribers is not None:
+                subscribers.pop(queue, None)
+                if not subscribers:
+                    del self._subscribers[text_id]
+
+    def publish(self, text_id, event):
+        """任意のスレッドから呼び出せる。接続中の購読者数を返す"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(text_id, {}).items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put, queue, event)
+            except RuntimeError:
+                # 終了済みのイベントループ（切断直後の接続）は無視する
+                pass
+        return len(subscribers)
+
+
+phase_event_broker = PhaseEventBroker()
@@ -0,0 +1,84 @@
+"""クラス進捗ボード（生徒 × 文章）の集計
+
+読解セッションごとのフェーズ・読解時間・回答済みの問題数・最終活動時刻を1回のクエリで読む。
+回答数は QuestionResponse との結合の件数、最終活動時刻は活動ログの書き込み時に更新される
+ActivityCounter の最大値を相関サブクエリで求める（生ログは走査しない）。
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import ActivityCounter, ReadingSession, Text
+
+
+def _reading_seconds(session, now):
+    """読解フェーズの経過時間（読解終了・解答開始の前なら現在まで。文章を開く前は None）"""
+    if session['reading_start_time'] is None:
+        return None
+    end = session['reading_end'] or now
+    return max(0, int((end - session['reading_start_time']).total_seconds()))
+
+
+def build_class_progress(text_ids):
+    """文章ごとの全生徒の進捗を返す（セッションのない組はセルを返さない）"""
+    texts = list(
+        Text.objects.filter(id__in=text_ids).order_by('-id').annotate(
+            question_count=Count('question')
+        ).values('id', 'title', 'question_count')
+    )
+    students = list(
+        User.objects.filter(userprofile__is_teacher=False).order_by('username').values('id', 'username')
+    )
+
+    last_activity = ActivityCounter.objects.filter(
+        text_id=OuterRef('text_id'), student_id=OuterRef('student_id')
+    ).order_by().values('text_id').annotate(last=Max('last_activity_at')).values('last')
+    sessions = ReadingSession.objects.filter(text_id__in=text_ids).annotate(
+        answered_count=Count(
+            'questionresponse',
+            filter=Q(questionresponse__selected_choice__isnull=False) | ~Q(questionresponse__response_text='')
+        ),
+        reading_end=Coalesce('reading_end_time', 'answering_start_time'),
+        last_activity_at=Subquery(last_activity)
+    ).values(
+        'student_id', 'text_id', 'current_phase', 'reading_start_time', 'reading_end',
+        'answered_count', 'last_activity_at'
+    ).order_by()
+
+    now = timezone.now()
+    return {
+        'generated_at': now.isoformat(),
+        'texts': texts,
+        'students': students,
+        'cells': [
+            {
+                'student_id': session['student_id'],
+                'text_id': session['text_id'],
+                'phase': session['current_phase'],
+                'reading_seconds': _reading_seconds(session, now),
+                'answered_count': session['answered_count'],
+                'last_activity_at': session['last_activity_at'].isoformat() if session['last_activity_at'] else None,
+            }
+            for session in sessions
+        ],
+    }
+
+
+def class_progress(teacher, text_ids=None):
+    """教員の有効な文章（text_ids 指定時はその中から）の進捗を短時間キャッシュして返す"""
+    texts = Text.objects.filter(created_by=teacher, is_active=True)
+    if text_ids:
+        texts = texts.filter(id__in=text_ids)
+    text_ids = sorted(texts.values_list('id', flat=True))
+
+    cache_key = 'class_progress:' + hashlib.sha1(','.join(map(str, text_ids)).encode()).hexdigest()
+    progress = cache.get(cache_key)
+    if progress is None:
+        progress = build_class_progress(text_ids)
+        cache.set(cache_key, progress, settings.CLASS_PROGRESS_CACHE_TIMEOUT)
+    return progress
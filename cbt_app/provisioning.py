@@ -0,0 +1,30 @@
+"""読解セッションの一括作成
+
+試験開始時に生徒全員が同時に文章を開くと、各リクエストの get_or_create が
+同じ一意制約に対して競合する。事前にまとめて作成しておくと、ページの読み込みは読み取りだけになる。
+作成したセッションの読解開始時刻は空のままにし、生徒が文章を初めて開いた時点で記録する。
+"""
+from django.contrib.auth.models import User
+
+from .models import ReadingSession
+
+
+def provision_reading_sessions(text, student_ids=None):
+    """生徒全員（または指定した生徒）の読解セッションを作成し、新たに作成した件数を返す"""
+    students = User.objects.filter(is_active=True, userprofile__is_teacher=False)
+    if student_ids is not None:
+        students = students.filter(id__in=student_ids)
+    student_ids = set(students.values_list('id', flat=True))
+
+    existing = set(
+        ReadingSession.objects.filter(text=text, student_id__in=student_ids).values_list('student_id', flat=True)
+    )
+    missing = sorted(student_ids - existing)
+
+    # 同時に生徒が文章を開いて作成された行とは衝突しても無視する
+    ReadingSession.objects.bulk_create(
+        [ReadingSession(student_id=student_id, text=text) for student_id in missing],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    return len(missing)
@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .exam_paper import invalidate_exam_paper
+from .grading import schedule_text_regrade
+from .models import Question, QuestionChoice, Text, UserProfile
+from .students import schedule_student_count_refresh
+from .text_render import cache_text_body
+
+
+@receiver(post_save, sender=Text)
+def render_text_body_on_save(sender, instance, **kwargs):
+    """文章の保存時に本文HTMLを描画してキャッシュしておく"""
+    cache_text_body(instance)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def refresh_on_question_change(sender, instance, **kwargs):
+    """問題冊子のキャッシュを無効化し、採点対象が変わるため文章全体を採点し直す"""
+    invalidate_exam_paper(instance.text_id, instance.id)
+    schedule_text_regrade(instance.text_id)
+
+
+@receiver(post_save, sender=QuestionChoice)
+@receiver(post_delete, sender=QuestionChoice)
+def refresh_on_choice_change(sender, instance, **kwargs):
+    """問題冊子のキャッシュを無効化し、正答が変わった場合に備えて文章全体を採点し直す"""
+    text_id = Question.objects.filter(id=instance.question_id).values_list('text_id', flat=True).first()
+    # 問題ごと削除された場合は問題側のシグナルで処理する
+    if text_id is not None:
+        invalidate_exam_paper(text_id)
+        schedule_text_regrade(text_id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def refresh_student_count_on_change(sender, instance, **kwargs):
+    """生徒の追加・削除（教員・生徒の切り替えを含む）時に生徒数を数え直す"""
+    schedule_student_count_refresh()
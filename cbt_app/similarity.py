@@ -0,0 +1,161 @@
+"""記述回答の類似検出（MinHash + LSH）
+
+回答を文字n-gramの集合にして MinHash 署名を作り、回答ごとに EssaySignature に保存する。
+類似の検出では署名を帯（バンド）に分けたハッシュが一致する組だけを候補にするため、
+全ての組を比較せずに済む。候補の組は署名の一致率（Jaccard係数の推定値）で確かめ、
+閾値以上の組を連結してクラスタにまとめる。
+"""
+import hashlib
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import EssaySignature, QuestionResponse
+
+NGRAM_SIZE = 3
+NUM_PERM = 128
+# 1バンドあたり4行。推定類似度0.4前後から候補になり始め、0.6で候補になる確率は約99%
+BANDS = 32
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# 置換ごとのハッシュ関数 (a * x + b) mod p の係数（署名を保存するため乱数の種は固定する）
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(1729)
+_A = _rng.integers(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize_text(text):
+    """全角・半角を揃え、空白を除き、小文字にする"""
+    return ''.join(unicodedata.normalize('NFKC', text or '').split()).lower()
+
+
+def shingle_hashes(text):
+    """正規化済みの文字列の文字n-gramを32ビットのハッシュ値の配列にする"""
+    shingles = {text[i:i + NGRAM_SIZE] for i in range(max(1, len(text) - NGRAM_SIZE + 1))}
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=4).digest(), 'little') for shingle in shingles],
+        dtype=np.uint64
+    )
+
+
+def minhash(text):
+    """回答の MinHash 署名（uint32 × NUM_PERM）を返す（短すぎる回答は None）"""
+    text = normalize_text(text)
+    if len(text) < settings.ESSAY_SIMILARITY_MIN_LENGTH:
+        return None
+    hashes = shingle_hashes(text)
+    # 積は uint64 の範囲で桁あふれする（2^64 を法とした値になる）が、置換としての性質には影響しない
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % _MERSENNE_PRIME
+    return (permuted.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+
+def _encode(signature):
+    return b'' if signature is None else signature.astype('<u4').tobytes()
+
+
+def _decode(data):
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+
+def update_essay_signatures(responses):
+    """(回答ID, 問題ID, 回答内容) の組から署名を作り直して保存する"""
+    signatures = [
+        EssaySignature(response_id=response_id, question_id=question_id, signature=_encode(minhash(response_text)))
+        for response_id, question_id, response_text in responses
+    ]
+    EssaySignature.objects.bulk_create(
+        signatures,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['response'],
+        update_fields=['signature', 'updated_at']
+    )
+    return len(signatures)
+
+
+def refresh_stale_signatures(question_ids):
+    """署名がないか、署名より後に更新された回答の署名を作り直す（管理画面での編集や既存データ向け）"""
+    stale = QuestionResponse.objects.filter(question_id__in=question_ids).filter(
+        Q(essay_signature__isnull=True) | Q(essay_signature__updated_at__lt=F('updated_at'))
+    ).values_list('id', 'question_id', 'response_text')
+    return update_essay_signatures(stale.iterator())
+
+
+def candidate_pairs(matrix):
+    """署名の行列（回答 × NUM_PERM）から、いずれかのバンドが一致する行の組を返す"""
+    buckets = defaultdict(list)
+    bands = matrix.reshape(len(matrix), BANDS, ROWS_PER_BAND)
+    for band in range(BANDS):
+        for row, key in enumerate(bands[:, band, :]):
+            buckets[band, key.tobytes()].append(row)
+
+    pairs = set()
+    for rows in buckets.values():
+        for i, first in enumerate(rows):
+            for second in rows[i + 1:]:
+                pairs.add((first, second))
+    return np.array(sorted(pairs), dtype=np.int64).reshape(-1, 2)
+
+
+def _find(parents, row):
+    while parents[row] != row:
+        parents[row] = parents[parents[row]]
+        row = parents[row]
+    return row
+
+
+def find_clusters(matrix, threshold):
+    """推定類似度が閾値以上の組をつないだクラスタを返す
+
+    各クラスタは {'rows': [行番号], 'pairs': [(行, 行, 類似度)]}。
+    """
+    pairs = candidate_pairs(matrix)
+    similarities = (matrix[pairs[:, 0]] == matrix[pairs[:, 1]]).mean(axis=1) if len(pairs) else np.empty(0)
+    keep = similarities >= threshold
+    pairs, similarities = pairs[keep], similarities[keep]
+
+    parents = list(range(len(matrix)))
+    for first, second in pairs.tolist():
+        parents[_find(parents, first)] = _find(parents, second)
+
+    clusters = defaultdict(lambda: {'rows': set(), 'pairs': []})
+    for (first, second), similarity in zip(pairs.tolist(), similarities.tolist()):
+        cluster = clusters[_find(parents, first)]
+        cluster['rows'].update((first, second))
+        cluster['pairs'].append((first, second, similarity))
+    return [
+        {'rows': sorted(cluster['rows']), 'pairs': cluster['pairs']}
+        for cluster in clusters.values()
+    ]
+
+
+def essay_clusters(question_id, threshold=None):
+    """記述問題の回答のうち、互いに似ている回答のクラスタを返す（大きく、類似度が高い順）"""
+    threshold = settings.ESSAY_SIMILARITY_THRESHOLD if threshold is None else threshold
+    rows = list(
+        EssaySignature.objects.filter(question_id=question_id).exclude(signature=b'').values_list(
+            'response_id', 'response__session__student_id', 'response__session__student__username', 'signature'
+        )
+    )
+    matrix = np.array([_decode(row[3]) for row in rows], dtype=np.uint32).reshape(-1, NUM_PERM)
+
+    clusters = []
+    for cluster in find_clusters(matrix, threshold):
+        clusters.append({
+            'size': len(cluster['rows']),
+            'max_similarity': round(max(similarity for _, _, similarity in cluster['pairs']), 4),
+            'members': [
+                {'response_id': rows[row][0], 'student_id': rows[row][1], 'username': rows[row][2]}
+                for row in cluster['rows']
+            ],
+            'pairs': [
+                {'response_a': rows[first][0], 'response_b': rows[second][0], 'similarity': round(similarity, 4)}
+                for first, second, similarity in sorted(cluster['pairs'], key=lambda pair: -pair[2])
+            ],
+        })
+    clusters.sort(key=lambda cluster: (-cluster['size'], -cluster['max_similarity']))
+    return {'compared_count': len(rows), 'clusters': clusters}
@@ -0,0 +1,31 @@
+"""生徒数のキャッシュ
+
+教員ダッシュボードを開くたびに全生徒を数えないよう、生徒数をキャッシュしておく。
+UserProfile の作成・変更・削除時にシグナルから数え直す。
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+STUDENT_COUNT_CACHE_KEY = 'student_count'
+
+
+def refresh_student_count():
+    """生徒数を数え直してキャッシュする"""
+    count = User.objects.filter(userprofile__is_teacher=False).count()
+    cache.set(STUDENT_COUNT_CACHE_KEY, count, settings.STUDENT_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def get_student_count():
+    """キャッシュした生徒数を返す（なければ数える）"""
+    count = cache.get(STUDENT_COUNT_CACHE_KEY)
+    if count is None:
+        count = refresh_student_count()
+    return count
+
+
+def schedule_student_count_refresh():
+    """コミット後に生徒数を数え直す（コミット前の件数がキャッシュに残らないように）"""
+    transaction.on_commit(refresh_student_count)
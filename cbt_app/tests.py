@@ -1,3 +1,189 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .answers import save_question_responses
+from .grading import build_response_matrix, grade_text, score_matrix
+from .models import (
+    Question, QuestionChoice, QuestionResponse, ReadingSession, SessionScore, StudentAnnotation, Text, UserProfile
+)
+from .text_render import TEXT_BODY_OFFSET_BASE, text_end_position
+
+
+class ExamFixtureMixin:
+    """教員・生徒・文章と選択問題2問（各2択）を用意する"""
+
+    def setUp(self):
+        # 問題冊子のキャッシュはコミット時に無効化されるため、テストごとに消しておく
+        cache.clear()
+        self.teacher = User.objects.create_user('teacher', password='pw')
+        UserProfile.objects.create(user=self.teacher, is_teacher=True)
+        self.student = User.objects.create_user('student', password='pw')
+        UserProfile.objects.create(user=self.student)
+        self.text = Text.objects.create(title='文章', content='一行目\n二行目\n\n第二段落です。', created_by=self.teacher)
+
+        self.questions = []
+        self.correct = []
+        self.wrong = []
+        for order in (1, 2):
+            question = Question.objects.create(
+                text=self.text, question_text=f'問{order}', question_type='choice', order=order
+            )
+            self.questions.append(question)
+            self.correct.append(QuestionChoice.objects.create(question=question, choice_text='正', order=1, is_correct=True))
+            self.wrong.append(QuestionChoice.objects.create(question=question, choice_text='誤', order=2))
+
+    def create_session(self, student, phase='answering'):
+        return ReadingSession.objects.create(
+            student=student, text=self.text, current_phase=phase,
+            reading_start_time=timezone.now(), answering_start_time=timezone.now()
+        )
+
+
+class ScoreMatrixTests(TestCase):
+    def test_build_response_matrix_places_choices_by_sorted_ids(self):
+        matrix = build_response_matrix(
+            np.array([10, 20]), np.array([1, 2, 3]),
+            [(20, 3, 7), (10, 1, 5), (10, 2, None)]
+        )
+        np.testing.assert_array_equal(matrix, [[5, 0, 0], [0, 0, 7]])
+
+    def test_score_matrix_counts_answered_and_correct(self):
+        matrix = np.array([[5, 6, 0], [4, 6, 9], [0, 0, 0]])
+        answered, correct = score_matrix(matrix, np.array([5, 6, 8]))
+        np.testing.assert_array_equal(answered, [2, 3, 0])
+        np.testing.assert_array_equal(correct, [2, 1, 0])
+
+
+class GradeTextTests(ExamFixtureMixin, TestCase):
+    def test_grade_text_saves_scores_per_session(self):
+        other = User.objects.create_user('other', password='pw')
+        first = self.create_session(self.student)
+        second = self.create_session(other)
+        QuestionResponse.objects.create(session=first, question=self.questions[0], selected_choice=self.correct[0])
+        QuestionResponse.objects.create(session=first, question=self.questions[1], selected_choice=self.wrong[1])
+        QuestionResponse.objects.create(session=second, question=self.questions[0], selected_choice=self.correct[0])
+        QuestionResponse.objects.create(session=second, question=self.questions[1], selected_choice=self.correct[1])
+
+        self.assertEqual(grade_text(self.text.id), 2)
+
+        scores = {score.session_id: score for score in SessionScore.objects.all()}
+        self.assertEqual((scores[first.id].answered_count, scores[first.id].correct_count), (2, 1))
+        self.assertEqual(scores[first.id].score, 50.0)
+        self.assertEqual((scores[second.id].correct_count, scores[second.id].score), (2, 100.0))
+
+    def test_grade_text_limited_to_sessions_updates_only_those(self):
+        first = self.create_session(self.student)
+        QuestionResponse.objects.create(session=first, question=self.questions[0], selected_choice=self.correct[0])
+        grade_text(self.text.id)
+
+        other = self.create_session(User.objects.create_user('other', password='pw'))
+        QuestionResponse.objects.create(session=other, question=self.questions[0], selected_choice=self.wrong[0])
+        self.assertEqual(grade_text(self.text.id, [other.id]), 1)
+        self.assertEqual(SessionScore.objects.get(session=first).correct_count, 1)
+        self.assertEqual(SessionScore.objects.get(session=other).correct_count, 0)
+
+
+class SaveQuestionResponsesTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.session = self.create_session(self.student)
+
+    def save(self, **answer):
+        with mock.patch('cbt_app.answers.grade_text') as grade:
+            with self.captureOnCommitCallbacks(execute=True):
+                save_question_responses(self.session, [{'question_id': self.questions[0].id, **answer}])
+        return grade
+
+    def test_regrades_after_commit_when_the_choice_changes(self):
+        grade = self.save(selected_choice_id=self.correct[0].id)
+        grade.assert_called_once_with(self.text.id, [self.session.id])
+
+        grade = self.save(selected_choice_id=self.wrong[0].id)
+        grade.assert_called_once_with(self.text.id, [self.session.id])
+
+    def test_does_not_regrade_when_only_the_confidence_changes(self):
+        self.save(selected_choice_id=self.correct[0].id)
+        grade = self.save(selected_choice_id=self.correct[0].id, confidence_level=5)
+
+        grade.assert_not_called()
+        response = QuestionResponse.objects.get(session=self.session, question=self.questions[0])
+        self.assertEqual(response.confidence_level, 5)
+
+    def test_overwrites_the_previous_answer(self):
+        self.save(selected_choice_id=self.correct[0].id)
+        self.save(selected_choice_id=self.wrong[0].id)
+
+        responses = QuestionResponse.objects.filter(session=self.session)
+        self.assertEqual(list(responses.values_list('selected_choice_id', flat=True)), [self.wrong[0].id])
+
+
+# 画面の描画はcollectstatic前でも行えるよう、マニフェストを使わない保存先にする
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class SyncAnnotationsTests(ExamFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.student)
+        self.end = text_end_position(self.text.content)
+
+    def sync(self, **changes):
+        response = self.client.post(
+            reverse('cbt_app:sync_annotations'),
+            json.dumps({'text_id': self.text.id, **changes}),
+            content_type='application/json'
+        )
+        return response.json()
+
+    def highlight(self, client_id, start, end):
+        return {'client_id': client_id, 'annotation_type': 'highlight', 'start_position': start, 'end_position': end}
+
+    def test_body_offset_base_matches_the_text_page(self):
+        html = self.client.get(reverse('cbt_app:text_detail', args=[self.text.id])).content.decode()
+        opening = f'data-text-id="{self.text.id}">'
+        prefix = html[html.index(opening) + len(opening):html.index('<p data-offset')]
+        self.assertEqual(len(prefix), TEXT_BODY_OFFSET_BASE)
+
+    def test_creates_return_server_ids_and_reject_invalid_items_alone(self):
+        data = self.sync(creates=[
+            self.highlight('c-1', TEXT_BODY_OFFSET_BASE, self.end),
+            self.highlight('c-2', 0, self.end + 1),
+            {'annotation_type': 'highlight', 'start_position': 0, 'end_position': 1},
+        ])
+
+        self.assertTrue(data['success'])
+        annotation = StudentAnnotation.objects.get()
+        self.assertEqual(data['id_map'], {'c-1': annotation.id})
+        self.assertEqual([item['client_id'] for item in data['rejected']], ['c-2', None])
+        self.assertEqual((annotation.start_position, annotation.end_position), (TEXT_BODY_OFFSET_BASE, self.end))
+
+    def test_updates_and_deletes_apply_to_own_annotations(self):
+        created = self.sync(creates=[self.highlight('a', 21, 23), self.highlight('b', 24, 26)])['id_map']
+        other = StudentAnnotation.objects.create(
+            student=self.teacher, text=self.text, annotation_type='highlight', start_position=21, end_position=22
+        )
+
+        data = self.sync(
+            updates=[{'id': created['a'], 'end_position': '25'}, {'id': other.id, 'end_position': 30}],
+            deletes=[created['b'], other.id]
+        )
+
+        self.assertEqual(data['updated'], [created['a']])
+        self.assertEqual(data['missing'], [other.id])
+        self.assertEqual(data['deleted'], 1)
+        self.assertEqual(StudentAnnotation.objects.get(id=created['a']).end_position, 25)
+        self.assertTrue(StudentAnnotation.objects.filter(id=other.id).exists())
+
+    def test_invalid_update_is_rejected_without_changes(self):
+        created = self.sync(creates=[self.highlight('a', 21, 23)])['id_map']
+
+        data = self.sync(updates=[{'id': created['a'], 'end_position': 'x'}])
+
+        self.assertEqual(data['updated'], [])
+        self.assertEqual([item['id'] for item in data['rejected']], [created['a']])
+        self.assertEqual(StudentAnnotation.objects.get(id=created['a']).end_position, 23)
@@ -0,0 +1,83 @@
+"""文章本文の描画と、描画結果のキャッシュ
+
+linebreaks フィルタと同じ構造（同じテキストノード）のHTMLを出力しつつ、段落と行の先頭に
+data-offset（本文先頭からの文字位置）を付ける。ブラウザ側はこの値から選択位置を
+文書全体を走査せずに求められる。行は要素で囲まず空の目印の要素を置くだけにし、
+段落内のテキストノードは <p> の直下に残す（行をまたぐ範囲を surroundContents で囲めるように）。
+"""
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import normalize_newlines
+
+# 描画方法を変えたときはこの値を上げて古いキャッシュを使わないようにする
+TEXT_BODY_RENDER_VERSION = 2
+# 文章ページ（text_detail.html）で本文の前に入る空白のテキストノードの長さ。
+# ブラウザが送る注釈・段落の位置は .text-content 全体の文字位置で、本文の data-offset にこの値を足したものになる
+TEXT_BODY_OFFSET_BASE = 21
+
+
+def utf16_length(value):
+    """JavaScript の String.length と同じ UTF-16 単位の長さ"""
+    return len(value.encode('utf-16-le')) // 2
+
+
+def utf16_slice(value, start, end):
+    """UTF-16 単位の位置で切り出す（JavaScript の String.slice と同じ。サロゲートペアの途中でも切る）"""
+    return value.encode('utf-16-le', 'surrogatepass')[2 * start:2 * end].decode('utf-16-le', 'surrogatepass')
+
+
+def text_length(content):
+    """本文の文字位置（data-offset）の範囲の長さ
+
+    段落の区切りは2文字、段落内の改行は <br> になるため0文字として数える。
+    """
+    paragraphs = re.split('\n{2,}', normalize_newlines(content))
+    return sum(utf16_length(paragraph.replace('\n', '')) for paragraph in paragraphs) + 2 * (len(paragraphs) - 1)
+
+
+def text_end_position(content):
+    """ブラウザが送る文字位置で数えた本文の終わりの位置"""
+    return TEXT_BODY_OFFSET_BASE + text_length(content)
+
+
+def render_text_body(content):
+    """本文を data-offset 付きのHTMLに変換する"""
+    paragraphs = re.split('\n{2,}', normalize_newlines(content))
+
+    html = []
+    offset = 0
+    for index, paragraph in enumerate(paragraphs):
+        if index:
+            # 段落の間には "\n\n" のテキストノードが入る
+            offset += 2
+        paragraph_offset = offset
+        lines = []
+        for line in paragraph.split('\n'):
+            lines.append(f'<span class="text-line" data-offset="{offset}"></span>{escape(line)}' if line else '')
+            offset += utf16_length(line)
+        html.append(f'<p data-offset="{paragraph_offset}">' + '<br>'.join(lines) + '</p>')
+    return '\n\n'.join(html)
+
+
+def text_body_cache_key(text):
+    content_hash = hashlib.sha1(text.content.encode()).hexdigest()
+    return f'text_body:v{TEXT_BODY_RENDER_VERSION}:{text.id}:{content_hash}'
+
+
+def cache_text_body(text):
+    """本文を描画してキャッシュに保存する（文章の保存時に呼ばれる）"""
+    html = render_text_body(text.content)
+    cache.set(text_body_cache_key(text), html, None)
+    return html
+
+
+def get_text_body(text):
+    """キャッシュ済みの本文HTMLを返す（未描画なら描画してキャッシュする）"""
+    html = cache.get(text_body_cache_key(text))
+    if html is None:
+        html = cache_text_body(text)
+    return mark_safe(html)
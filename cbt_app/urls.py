@@ -16,12 +16,18 @@ urlpatterns = [
     path('teacher/students/', views.manage_students, name='manage_students'),
     path('teacher/students/add/', views.add_student, name='add_student'),
     path('teacher/students/edit/<int:student_id>/', views.edit_student, name='edit_student'),
+    path('teacher/progress/', views.class_progress_board, name='class_progress_board'),
+    
+    # 本文API
+    path('api/text/<int:text_id>/bootstrap/', views.text_bootstrap, name='text_bootstrap'),
+    path('api/text/<int:text_id>/content/', views.get_text_content, name='get_text_content'),
     
     # 注釈関連API
     path('api/save-annotation/', views.save_annotation, name='save_annotation'),
     path('api/get-annotations/<int:text_id>/', views.get_annotations, name='get_annotations'),
     path('api/update-annotation/<int:annotation_id>/', views.update_annotation, name='update_annotation'),
     path('api/delete-annotation/<int:annotation_id>/', views.delete_annotation, name='delete_annotation'),
+    path('api/sync-annotations/', views.sync_annotations, name='sync_annotations'),
     
     # 積極的読み分析API
     path('api/save-active-reading-content/', views.save_active_reading_content, name='save_active_reading_content'),
@@ -40,7 +46,30 @@ urlpatterns = [
     path('api/transition-to-answering/', views.transition_to_answering, name='transition_to_answering'),
     path('api/transition-to-reading/', views.transition_to_reading, name='transition_to_reading'),
     path('api/get-all-memos/<int:text_id>/', views.get_all_memos, name='get_all_memos'),
+    path('api/text/<int:text_id>/phase-events/', views.phase_events, name='phase_events'),
+    
+    # 問題回答API
+    path('api/autosave-response/', views.autosave_response, name='autosave_response'),
+    path('api/submit-all-responses/', views.submit_all_responses, name='submit_all_responses'),
     
     # 活動ログAPI
     path('api/log-activity/', views.log_activity, name='log_activity'),
+    path('api/log-activity-batch/', views.log_activity_batch, name='log_activity_batch'),
+    
+    # 教員向け操作API
+    path('api/teacher/provision-sessions/<int:text_id>/', views.provision_reading_sessions, name='provision_reading_sessions'),
+    path('api/teacher/set-phase/<int:text_id>/', views.set_class_phase, name='set_class_phase'),
+    
+    # 教員向け集計API
+    path('api/teacher/activity-summary/<int:text_id>/', views.activity_summary, name='activity_summary'),
+    path('api/teacher/progress/', views.class_progress, name='class_progress'),
+    path('api/teacher/proctoring-counters/<int:text_id>/', views.proctoring_counters, name='proctoring_counters'),
+    path('api/teacher/highlight-heatmap/<int:text_id>/', views.highlight_heatmap, name='highlight_heatmap'),
+    path('api/teacher/scores/<int:text_id>/', views.session_scores, name='session_scores'),
+    path('api/teacher/item-analysis/<int:text_id>/', views.item_analysis, name='item_analysis'),
+    path('api/teacher/essay-clusters/<int:text_id>/', views.essay_clusters, name='essay_clusters'),
+    path('api/teacher/calibration/<int:text_id>/', views.calibration_summary, name='calibration_summary'),
+    
+    # 研究データエクスポート（教員・スタッフ専用）
+    path('api/teacher/export/<str:kind>/', views.export_data, name='export_data'),
 ]
@@ -3,18 +3,49 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.utils.cache import patch_cache_control
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Substr
+from asgiref.sync import sync_to_async
+from datetime import datetime, time, timedelta
+from functools import wraps
+import asyncio
+import hashlib
 import json
 
 from .models import (
-    Text, Question, QuestionChoice, UserProfile, StudentResponse, StudentAnnotation,
+    Text, UserProfile, StudentResponse, StudentAnnotation,
     StudentActivityLog, ParagraphSummary, ConceptMap, ComparisonTable,
     ArgumentStructure, ActiveReadingContent, UserParagraphDefinition,
-    ReadingSession, QuestionResponse
+    ReadingSession, QuestionResponse, ActivityDailyRollup, ActivityCounter, SessionScore, CalibrationSummary,
+    PHASE_TRANSITIONS
 )
+from .activity_writer import write_activity_logs
+from .answers import AnswerError, save_question_responses
+from .calibration import summarize_text
+from .grading import grade_text
+from .exam_paper import get_exam_paper, get_exam_question, get_question_text_id
+from .exports import EXPORTS, build_export_queryset, stream_csv, stream_ndjson
+from .heatmap import highlight_heatmap as build_highlight_heatmap
+from .item_analysis import item_analysis as build_item_analysis
+from .phase_events import phase_event_broker
+from .progress import class_progress as build_class_progress
+from .provisioning import provision_reading_sessions as create_reading_sessions
+from .similarity import essay_clusters as build_essay_clusters, refresh_stale_signatures
+from .students import get_student_count
+from .text_render import get_text_body, text_end_position, utf16_length, utf16_slice
+
+# ダッシュボードに表示する本文の抜粋の長さ（文字数）
+TEXT_EXCERPT_LENGTH = 100
 
 def home(request):
     """ホームページ"""
@@ -52,17 +83,54 @@ def dashboard(request):
         user_profile = UserProfile.objects.create(user=request.user, is_teacher=False)
     
     if user_profile.is_teacher:
-        # 教員用ダッシュボード
+        # 教員用ダッシュボード（一覧に本文は不要なため読み込まない）
         texts = Text.objects.filter(created_by=request.user, is_active=True)
-        student_count = User.objects.filter(userprofile__is_teacher=False).count()
+        page, next_before = _keyset_page(
+            texts.only('id', 'title', 'author', 'created_at', 'is_active'), request
+        )
         return render(request, 'cbt_app/teacher_dashboard.html', {
-            'texts': texts,
-            'student_count': student_count
+            'texts': page,
+            'next_before': next_before,
+            'student_count': get_student_count()
         })
     else:
-        # 生徒用ダッシュボード
-        texts = Text.objects.filter(is_active=True)
-        return render(request, 'cbt_app/student_dashboard.html', {'texts': texts})
+        # 生徒用ダッシュボード（本文は冒頭の抜粋だけを取得する）
+        texts = Text.objects.filter(is_active=True).only('id', 'title', 'author').annotate(
+            excerpt=Substr('content', 1, TEXT_EXCERPT_LENGTH)
+        )
+        page, next_before = _keyset_page(texts, request)
+        return render(request, 'cbt_app/student_dashboard.html', {
+            'texts': page,
+            'next_before': next_before
+        })
+
+def _keyset_page(queryset, request):
+    """新しい順に1ページ分を返す（?before=<id> より前のページ。OFFSETを使わないキーセット方式）"""
+    queryset = queryset.order_by('-id')
+    try:
+        before = int(request.GET.get('before', ''))
+        queryset = queryset.filter(id__lt=before)
+    except ValueError:
+        pass
+
+    # 1件多く取得して次のページがあるかを判定する
+    page_size = settings.TEXT_LIST_PAGE_SIZE
+    items = list(queryset[:page_size + 1])
+    next_before = items[page_size - 1].id if len(items) > page_size else None
+    return items[:page_size], next_before
+
+def _username_page(queryset, request):
+    """ユーザー名順に1ページ分を返す（?after=<username> より後のページ。キーセット方式）"""
+    queryset = queryset.order_by('username')
+    after = request.GET.get('after')
+    if after:
+        queryset = queryset.filter(username__gt=after)
+
+    # 1件多く取得して次のページがあるかを判定する
+    page_size = settings.STUDENT_LIST_PAGE_SIZE
+    items = list(queryset[:page_size + 1])
+    next_after = items[page_size - 1].username if len(items) > page_size else None
+    return items[:page_size], next_after
 
 @login_required
 def text_detail(request, text_id):
@@ -70,32 +138,46 @@ def text_detail(request, text_id):
     text = get_object_or_404(Text, id=text_id, is_active=True)
     
     # 読解セッションを取得または作成
+    now = timezone.now()
     session, created = ReadingSession.objects.get_or_create(
         student=request.user,
-        text=text
+        text=text,
+        defaults={'reading_start_time': now}
     )
+    # 事前に作成されたセッションは、初めて開いた時点を読解開始時刻とする
+    if session.reading_start_time is None:
+        if ReadingSession.objects.filter(id=session.id).start_reading(now):
+            session.reading_start_time = now
+        else:
+            session.refresh_from_db(fields=['reading_start_time'])
     
     # フェーズに応じて問題を表示するかどうかを決定
     questions = []
     if session.current_phase == 'answering':
-        questions = Question.objects.filter(text=text).order_by('order')
+        questions = get_exam_paper(text.id)['questions']
     
     # 生徒の注釈を取得
     try:
         user_profile = request.user.userprofile
+        is_teacher = user_profile.is_teacher
         annotations = StudentAnnotation.objects.filter(
             student=request.user, 
             text=text
-        ) if not user_profile.is_teacher else []
+        ) if not is_teacher else []
     except UserProfile.DoesNotExist:
+        is_teacher = False
         annotations = []
     
     context = {
         'text': text,
+        'text_body': get_text_body(text),
         'questions': questions,
         'annotations': annotations,
         'current_phase': session.current_phase,
         'session': session,
+        'is_teacher': is_teacher,
+        # 各スクリプトが個別にAPIを呼ばなくて済むよう初期データを埋め込む
+        'bootstrap': _text_bootstrap(request.user, text, session),
     }
     
     return render(request, 'cbt_app/text_detail.html', context)
@@ -103,8 +185,10 @@ def text_detail(request, text_id):
 @login_required
 def question_detail(request, question_id):
     """問題詳細ページ"""
-    question = get_object_or_404(Question, id=question_id)
-    text = question.text
+    question = get_exam_question(question_id)
+    if question is None:
+        raise Http404('Question not found')
+    text = get_object_or_404(Text, id=get_question_text_id(question_id))
     
     # 読解セッションを確認
     try:
@@ -118,26 +202,35 @@ def question_detail(request, question_id):
         messages.error(request, '解答フェーズに移行してから問題に取り組んでください。')
         return redirect('cbt_app:text_detail', text_id=text.id)
     
+    # フォーム送信（JavaScriptが無効な場合の保存経路）
+    if request.method == 'POST':
+        try:
+            save_question_responses(session, [{
+                'question_id': question['id'],
+                'response_text': request.POST.get('response_text', ''),
+                'selected_choice_id': request.POST.get('selected_choice'),
+                'confidence_level': request.POST.get('confidence_level', 3),
+            }])
+            messages.success(request, '回答を保存しました。')
+        except AnswerError as e:
+            messages.error(request, f'回答を保存できませんでした: {e}')
+        return redirect('cbt_app:question_detail', question_id=question['id'])
+    
     # 既存の回答を取得
     try:
         existing_response = QuestionResponse.objects.get(
             session=session,
-            question=question
+            question_id=question['id']
         )
     except QuestionResponse.DoesNotExist:
         existing_response = None
     
-    # 選択肢を取得（選択問題の場合）
-    choices = []
-    if question.question_type == 'choice':
-        choices = QuestionChoice.objects.filter(question=question).order_by('order')
-    
     context = {
         'question': question,
         'text': text,
+        'text_body': get_text_body(text),
         'session': session,
         'existing_response': existing_response,
-        'choices': choices,
     }
     
     return render(request, 'cbt_app/question_detail.html', context)
@@ -145,6 +238,7 @@ def question_detail(request, question_id):
 # 教員専用機能
 def teacher_required(view_func):
     """教員権限が必要なビューのデコレータ"""
+    @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('cbt_app:login')
@@ -158,11 +252,46 @@ def teacher_required(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+def _teacher_text(request, text_id):
+    """教員が作成した文章を返す（他の教員の文章は存在しないものとして扱う）"""
+    return get_object_or_404(Text, id=text_id, created_by=request.user)
+
+def staff_or_teacher_required(view_func):
+    """教員またはスタッフ権限が必要なビューのデコレータ"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('cbt_app:login')
+        
+        if request.user.is_staff:
+            return view_func(request, *args, **kwargs)
+        return teacher_required(view_func)(request, *args, **kwargs)
+    return wrapper
+
 @teacher_required
 def manage_students(request):
     """生徒管理ページ"""
-    students = User.objects.filter(userprofile__is_teacher=False).order_by('username')
-    return render(request, 'cbt_app/manage_students.html', {'students': students})
+    students = User.objects.filter(userprofile__is_teacher=False).only(
+        'id', 'username', 'first_name', 'last_name', 'date_joined'
+    )
+    
+    # ユーザー名の前方一致検索（LIKEではなく範囲条件にしてユーザー名のインデックスを使う）
+    query = request.GET.get('q', '').strip()
+    if query:
+        students = students.filter(username__gte=query, username__lt=query + '\U0010ffff')
+    
+    page, next_after = _username_page(students, request)
+    return render(request, 'cbt_app/manage_students.html', {
+        'students': page,
+        'next_after': next_after,
+        'query': query,
+        'student_count': get_student_count()
+    })
+
+@teacher_required
+def class_progress_board(request):
+    """クラス進捗ボード（生徒 × 文章）ページ"""
+    return render(request, 'cbt_app/class_progress.html')
 
 @teacher_required
 def add_student(request):
@@ -213,8 +342,156 @@ def edit_student(request, student_id):
     
     return render(request, 'cbt_app/edit_student.html', {'student': student})
 
+# 条件付きGET（ETag / Last-Modified）
+
+def versioned(version_func):
+    """版情報で条件付きGETに応答するデコレータ
+    
+    version_func は (トークン, 最終更新時刻) を返す。If-None-Match が一致すれば
+    ビュー本体を呼ばずに（行を読み込まずに）304 を返す。トークンが None の場合は通常どおり応答する。
+    """
+    def decorator(view_func):
+        def wrapper(request, *args, **kwargs):
+            token, last_modified = version_func(request, *args, **kwargs)
+            if token is None:
+                response = view_func(request, *args, **kwargs)
+            else:
+                # ETag は生徒とクエリ文字列（範囲指定など）ごとに変える
+                etag = hashlib.md5(
+                    f'{request.user.id}:{request.GET.urlencode()}:{token}'.encode()
+                ).hexdigest()
+                response = condition(
+                    etag_func=lambda *a, **k: etag,
+                    last_modified_func=lambda *a, **k: last_modified
+                )(view_func)(request, *args, **kwargs)
+            # 生徒ごとの内容なので共有キャッシュには置かせず、毎回再検証させる
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+def _collection_version(*querysets):
+    """クエリセット群の件数と max(updated_at) から (トークン, 最終更新時刻) を作る"""
+    tokens = []
+    last_modified = None
+    for queryset in querysets:
+        version = queryset.aggregate(latest=Max('updated_at'), count=Count('id'))
+        tokens.append(f"{version['count']}:{version['latest'].isoformat() if version['latest'] else ''}")
+        if version['latest'] and (last_modified is None or version['latest'] > last_modified):
+            last_modified = version['latest']
+    return '|'.join(tokens), last_modified
+
+def _annotations_version(request, text_id):
+    return _collection_version(
+        StudentAnnotation.objects.filter(student=request.user, text_id=text_id, text__is_active=True)
+    )
+
+def _paragraphs_version(request, text_id):
+    return _collection_version(
+        UserParagraphDefinition.objects.filter(student=request.user, text_id=text_id, text__is_active=True)
+    )
+
+def _active_reading_content_version(request, text_id):
+    return _collection_version(
+        ActiveReadingContent.objects.filter(student=request.user, text_id=text_id, text__is_active=True)
+    )
+
+def _memos_version(request, text_id):
+    return _collection_version(
+        UserParagraphDefinition.objects.filter(student=request.user, text_id=text_id, text__is_active=True),
+        ActiveReadingContent.objects.filter(student=request.user, text_id=text_id, text__is_active=True)
+    )
+
+def _reading_session_version(request, text_id):
+    session = ReadingSession.objects.filter(
+        student=request.user, text_id=text_id, text__is_active=True
+    ).values_list('id', 'current_phase', 'reading_start_time', 'reading_end_time').first()
+    if session is None:
+        # まだセッションがない場合は作成が必要なので条件付き応答はしない
+        return None, None
+    times = [value for value in session[2:] if value]
+    return ':'.join(str(value) for value in session), max(times) if times else None
+
+def _bootstrap_version(request, text_id):
+    session_token, session_modified = _reading_session_version(request, text_id)
+    if session_token is None:
+        return None, None
+    token, last_modified = _collection_version(
+        StudentAnnotation.objects.filter(student=request.user, text_id=text_id, text__is_active=True),
+        UserParagraphDefinition.objects.filter(student=request.user, text_id=text_id, text__is_active=True),
+        ActiveReadingContent.objects.filter(student=request.user, text_id=text_id, text__is_active=True)
+    )
+    times = [value for value in (session_modified, last_modified) if value]
+    return f'{session_token}|{token}', max(times) if times else None
+
+# APIの応答形式
+
+def _serialize_annotation(annotation):
+    return {
+        'id': annotation.id,
+        'type': annotation.annotation_type,
+        'start_position': annotation.start_position,
+        'end_position': annotation.end_position,
+        'content': annotation.content,
+        'created_at': annotation.created_at.isoformat()
+    }
+
+def _serialize_paragraph(paragraph):
+    return {
+        'number': paragraph.paragraph_number,
+        'content': paragraph.content,
+        'startOffset': paragraph.start_offset,
+        'endOffset': paragraph.end_offset,
+        'createdAt': paragraph.created_at.isoformat()
+    }
+
+def _serialize_active_reading_content(item):
+    return {
+        'id': item.id,
+        'content_type': item.content_type,
+        'title': item.title,
+        'data': item.data,
+        'created_at': item.created_at.isoformat()
+    }
+
+def _serialize_reading_session(session):
+    return {
+        'id': session.id,
+        'current_phase': session.current_phase,
+        'reading_start_time': session.reading_start_time.isoformat() if session.reading_start_time else None,
+        'reading_end_time': session.reading_end_time.isoformat() if session.reading_end_time else None,
+    }
+
+def _text_bootstrap(user, text, session):
+    """文章ページの初期表示に必要なデータ一式（セッション・注釈・段落・分析コンテンツ）"""
+    annotations = StudentAnnotation.objects.filter(student=user, text=text).order_by('start_position')
+    paragraphs = UserParagraphDefinition.objects.filter(student=user, text=text).order_by('paragraph_number')
+    content = ActiveReadingContent.objects.filter(student=user, text=text).order_by('-created_at')
+    return {
+        'success': True,
+        'text_id': text.id,
+        'session': _serialize_reading_session(session),
+        'annotations': [_serialize_annotation(annotation) for annotation in annotations],
+        'paragraphs': [_serialize_paragraph(paragraph) for paragraph in paragraphs],
+        'active_reading_content': [_serialize_active_reading_content(item) for item in content],
+    }
+
 # API関数群
 
+def _annotation_positions(start_position, end_position, length):
+    """注釈の位置を整数にし、文章の範囲内（0 <= 開始 <= 終了 <= 本文の終わり）か確かめる
+
+    位置はブラウザの文字位置（本文の前の空白を含む）で、length は text_end_position の値。
+    """
+    try:
+        start_position, end_position = int(start_position), int(end_position)
+    except (TypeError, ValueError):
+        raise ValueError('start_position and end_position must be integers')
+    if not 0 <= start_position <= end_position <= length:
+        raise ValueError(f'positions must satisfy 0 <= start_position <= end_position <= {length}')
+    return start_position, end_position
+
+
 @login_required
 @csrf_exempt
 def save_annotation(request):
@@ -232,6 +509,9 @@ def save_annotation(request):
         
         # 文章の存在確認
         text = get_object_or_404(Text, id=text_id, is_active=True)
+        start_position, end_position = _annotation_positions(
+            start_position, end_position, text_end_position(text.content)
+        )
         
         # 注釈を保存
         annotation = StudentAnnotation.objects.create(
@@ -255,8 +535,53 @@ def save_annotation(request):
         })
 
 @login_required
+@versioned(_bootstrap_version)
+def text_bootstrap(request, text_id):
+    """文章ページの初期データを1回で返すAPI"""
+    try:
+        text = get_object_or_404(Text, id=text_id, is_active=True)
+        session, created = ReadingSession.objects.get_or_create(
+            student=request.user,
+            text=text
+        )
+        return JsonResponse(_text_bootstrap(request.user, text, session))
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@login_required
+def get_text_content(request, text_id):
+    """本文を文字範囲ごとに返すAPI（?offset=&limit=。長い文章を分割して読み込むため）
+
+    位置と長さは注釈の位置と同じく UTF-16 単位で数える（データベースの SUBSTR は文字単位のため使わない）。
+    """
+    try:
+        try:
+            offset = max(int(request.GET.get('offset', 0)), 0)
+            limit = int(request.GET.get('limit', settings.TEXT_CONTENT_MAX_CHUNK))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'offset and limit must be integers'})
+        limit = min(max(limit, 1), settings.TEXT_CONTENT_MAX_CHUNK)
+
+        content = Text.objects.filter(id=text_id, is_active=True).values_list('content', flat=True).first()
+        if content is None:
+            return JsonResponse({'success': False, 'error': 'Text not found'}, status=404)
+
+        length = utf16_length(content)
+        next_offset = offset + limit
+        return JsonResponse({
+            'success': True,
+            'offset': offset,
+            'length': length,
+            'content': utf16_slice(content, offset, next_offset),
+            'next_offset': next_offset if next_offset < length else None
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@login_required
+@versioned(_annotations_version)
 def get_annotations(request, text_id):
-    """注釈を取得するAPI"""
+    """注釈を取得するAPI（?start=&end= 指定時はその文字範囲に重なる注釈のみ）"""
     try:
         text = get_object_or_404(Text, id=text_id, is_active=True)
         annotations = StudentAnnotation.objects.filter(
@@ -264,20 +589,23 @@ def get_annotations(request, text_id):
             text=text
         ).order_by('start_position')
         
-        annotation_data = []
-        for annotation in annotations:
-            annotation_data.append({
-                'id': annotation.id,
-                'type': annotation.annotation_type,
-                'start_position': annotation.start_position,
-                'end_position': annotation.end_position,
-                'content': annotation.content,
-                'created_at': annotation.created_at.isoformat()
-            })
+        start = request.GET.get('start')
+        end = request.GET.get('end')
+        if start is not None or end is not None:
+            try:
+                start = int(start) if start is not None else 0
+                end = int(end) if end is not None else None
+            except ValueError:
+                return JsonResponse({'success': False, 'error': 'start and end must be integers'})
+            
+            # 半開区間 [start, end) と重なる注釈
+            annotations = annotations.filter(end_position__gt=start)
+            if end is not None:
+                annotations = annotations.filter(start_position__lt=end)
         
         return JsonResponse({
             'success': True,
-            'annotations': annotation_data
+            'annotations': [_serialize_annotation(annotation) for annotation in annotations]
         })
         
     except Exception as e:
@@ -339,6 +667,113 @@ def delete_annotation(request, annotation_id):
             'error': str(e)
         })
 
+@login_required
+@csrf_exempt
+def sync_annotations(request):
+    """注釈の作成・更新・削除の差分を1トランザクションでまとめて反映するAPI
+
+    種類や位置が不正な作成・更新はその項目だけを rejected として返し、他の変更は反映する。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST method required'})
+    
+    try:
+        data = json.loads(request.body)
+        text = get_object_or_404(Text, id=data.get('text_id'), is_active=True)
+        creates = data.get('creates', [])
+        updates = data.get('updates', [])
+        deletes = data.get('deletes', [])
+        
+        annotation_types = {choice for choice, _ in StudentAnnotation.ANNOTATION_TYPES}
+        editable_fields = ['annotation_type', 'start_position', 'end_position', 'content']
+        length = text_end_position(text.content)
+        now = timezone.now()
+        rejected = []
+        
+        # 作成は内容だけで検証できるため、トランザクションの前に不正なものを除く
+        valid_creates = []
+        for create in creates:
+            try:
+                # 応答の id_map はコミット後に組み立てるため、対応づけに使う client_id もここで確かめる
+                if not create.get('client_id'):
+                    raise ValueError('client_id is required')
+                if create.get('annotation_type') not in annotation_types:
+                    raise ValueError(f"invalid annotation_type: {create.get('annotation_type')}")
+                positions = _annotation_positions(create.get('start_position'), create.get('end_position'), length)
+            except ValueError as e:
+                rejected.append({'client_id': create.get('client_id'), 'error': str(e)})
+                continue
+            valid_creates.append((create, positions))
+        
+        with transaction.atomic():
+            annotations = StudentAnnotation.objects.filter(student=request.user, text=text)
+            
+            # 削除（DELETE ... WHERE id IN (...) 1回）
+            deleted = 0
+            if deletes:
+                deleted, _ = annotations.filter(id__in=deletes).delete()
+            
+            # 更新（bulk_update 1回。auto_now は効かないため updated_at を明示する）
+            updated = []
+            missing = []
+            if updates:
+                existing = annotations.in_bulk([update['id'] for update in updates])
+                changed_fields = {'updated_at'}
+                for update in updates:
+                    annotation = existing.get(update['id'])
+                    if annotation is None:
+                        missing.append(update['id'])
+                        continue
+                    for field in editable_fields:
+                        if field in update:
+                            setattr(annotation, field, update[field])
+                    try:
+                        if annotation.annotation_type not in annotation_types:
+                            raise ValueError(f'invalid annotation_type: {annotation.annotation_type}')
+                        annotation.start_position, annotation.end_position = _annotation_positions(
+                            annotation.start_position, annotation.end_position, length
+                        )
+                    except ValueError as e:
+                        rejected.append({'id': update['id'], 'error': str(e)})
+                        continue
+                    changed_fields.update(field for field in editable_fields if field in update)
+                    annotation.updated_at = now
+                    updated.append(annotation)
+                StudentAnnotation.objects.bulk_update(updated, sorted(changed_fields))
+            
+            # 作成（bulk_create 1回。クライアント側IDとの対応を返す）
+            new_annotations = []
+            for create, (start_position, end_position) in valid_creates:
+                new_annotations.append(
+                    StudentAnnotation(
+                        student=request.user,
+                        text=text,
+                        start_position=start_position,
+                        end_position=end_position,
+                        annotation_type=create['annotation_type'],
+                        content=create.get('content', '')
+                    )
+                )
+            StudentAnnotation.objects.bulk_create(new_annotations)
+        
+        return JsonResponse({
+            'success': True,
+            'id_map': {
+                create['client_id']: annotation.id
+                for (create, _), annotation in zip(valid_creates, new_annotations)
+            },
+            'updated': [annotation.id for annotation in updated],
+            'missing': missing,
+            'rejected': rejected,
+            'deleted': deleted
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
 @login_required
 @csrf_exempt
 def save_active_reading_content(request):
@@ -375,6 +810,7 @@ def save_active_reading_content(request):
         })
 
 @login_required
+@versioned(_active_reading_content_version)
 def get_active_reading_content(request, text_id):
     """積極的読み分析コンテンツを取得するAPI"""
     try:
@@ -384,19 +820,9 @@ def get_active_reading_content(request, text_id):
             text=text
         ).order_by('-created_at')
         
-        content_data = []
-        for item in content:
-            content_data.append({
-                'id': item.id,
-                'content_type': item.content_type,
-                'title': item.title,
-                'data': item.data,
-                'created_at': item.created_at.isoformat()
-            })
-        
         return JsonResponse({
             'success': True,
-            'content': content_data
+            'content': [_serialize_active_reading_content(item) for item in content]
         })
         
     except Exception as e:
@@ -484,6 +910,7 @@ def save_paragraph_definition(request):
         })
 
 @login_required
+@versioned(_paragraphs_version)
 def get_paragraph_definitions(request, text_id):
     """ユーザー定義段落を取得するAPI"""
     try:
@@ -493,19 +920,9 @@ def get_paragraph_definitions(request, text_id):
             text=text
         ).order_by('paragraph_number')
         
-        paragraph_data = []
-        for paragraph in paragraphs:
-            paragraph_data.append({
-                'number': paragraph.paragraph_number,
-                'content': paragraph.content,
-                'startOffset': paragraph.start_offset,
-                'endOffset': paragraph.end_offset,
-                'createdAt': paragraph.created_at.isoformat()
-            })
-        
         return JsonResponse({
             'success': True,
-            'paragraphs': paragraph_data
+            'paragraphs': [_serialize_paragraph(paragraph) for paragraph in paragraphs]
         })
         
     except Exception as e:
@@ -542,7 +959,11 @@ def delete_paragraph_definition(request, text_id, paragraph_number):
 @login_required
 @csrf_exempt
 def save_all_paragraphs(request):
-    """全ての段落を一括保存するAPI"""
+    """段落定義を一括保存するAPI（既存の行との差分だけを書き込む）
+    
+    total を省略した場合は paragraphs を全段落として扱い、含まれない段落を削除する。
+    total を指定した場合は paragraphs を変更分のみとして扱い、total を超える番号の段落を削除する。
+    """
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'POST method required'})
     
@@ -550,37 +971,81 @@ def save_all_paragraphs(request):
         data = json.loads(request.body)
         text_id = data.get('text_id')
         paragraphs = data.get('paragraphs', [])
+        total = data.get('total')
         
         text = get_object_or_404(Text, id=text_id, is_active=True)
         
-        # 既存の段落定義を全て削除
-        UserParagraphDefinition.objects.filter(
-            student=request.user,
-            text=text
-        ).delete()
-        
-        # 新しい段落定義を一括作成
-        paragraph_objects = []
+        incoming = {}
         for paragraph in paragraphs:
-            paragraph_objects.append(
-                UserParagraphDefinition(
+            number = int(paragraph['number'])
+            if total is not None and number > int(total):
+                raise ValueError(f'paragraph number {number} exceeds total {total}')
+            incoming[number] = paragraph
+        
+        now = timezone.now()
+        with transaction.atomic():
+            existing = {
+                paragraph.paragraph_number: paragraph
+                for paragraph in UserParagraphDefinition.objects.select_for_update().filter(
                     student=request.user,
-                    text=text,
-                    paragraph_number=paragraph['number'],
-                    content=paragraph['content'],
-                    start_offset=paragraph['startOffset'],
-                    end_offset=paragraph['endOffset']
+                    text=text
                 )
+            }
+            
+            # 不要になった段落番号
+            if total is None:
+                deleted_numbers = [number for number in existing if number not in incoming]
+            else:
+                deleted_numbers = [number for number in existing if number > int(total)]
+            
+            # 内容や範囲が変わった段落は更新し、新しい番号の段落は作成する
+            updated_paragraphs = []
+            new_paragraphs = []
+            for number, paragraph in incoming.items():
+                values = {
+                    'content': paragraph['content'],
+                    'start_offset': paragraph['startOffset'],
+                    'end_offset': paragraph['endOffset']
+                }
+                current = existing.get(number)
+                if current is None:
+                    new_paragraphs.append(
+                        UserParagraphDefinition(
+                            student=request.user,
+                            text=text,
+                            paragraph_number=number,
+                            **values
+                        )
+                    )
+                elif any(getattr(current, field) != value for field, value in values.items()):
+                    for field, value in values.items():
+                        setattr(current, field, value)
+                    current.updated_at = now
+                    updated_paragraphs.append(current)
+            
+            if deleted_numbers:
+                UserParagraphDefinition.objects.filter(
+                    student=request.user,
+                    text=text,
+                    paragraph_number__in=deleted_numbers
+                ).delete()
+            UserParagraphDefinition.objects.bulk_update(
+                updated_paragraphs, ['content', 'start_offset', 'end_offset', 'updated_at']
             )
+            UserParagraphDefinition.objects.bulk_create(new_paragraphs)
         
-        UserParagraphDefinition.objects.bulk_create(paragraph_objects)
-        
-        return JsonResponse({'success': True})
+        return JsonResponse({
+            'success': True,
+            'created': len(new_paragraphs),
+            'updated': len(updated_paragraphs),
+            'deleted': len(deleted_numbers)
+        })
         
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
 @login_required
+@versioned(_reading_session_version)
 def get_reading_session(request, text_id):
     """読解セッション情報を取得"""
     try:
@@ -592,21 +1057,17 @@ def get_reading_session(request, text_id):
         
         return JsonResponse({
             'success': True,
-            'session': {
-                'id': session.id,
-                'current_phase': session.current_phase,
-                'reading_start_time': session.reading_start_time.isoformat() if session.reading_start_time else None,
-                'reading_end_time': session.reading_end_time.isoformat() if session.reading_end_time else None,
-            }
+            'session': _serialize_reading_session(session)
         })
         
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
-@login_required
-@csrf_exempt
-def transition_to_answering(request):
-    """解答フェーズへの移行"""
+# 同じ冪等キーでの再送に同じ結果を返す期間（秒）
+IDEMPOTENCY_KEY_TIMEOUT = 60 * 60 * 24
+
+def _transition_phase(request, phase):
+    """自分の読解セッションを条件付きUPDATEで移行する（idempotency_key による再送に対応）"""
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'POST method required'})
     
@@ -614,17 +1075,80 @@ def transition_to_answering(request):
         data = json.loads(request.body)
         text_id = data.get('text_id')
         
-        text = get_object_or_404(Text, id=text_id, is_active=True)
-        session = get_object_or_404(ReadingSession, student=request.user, text=text)
+        # 同じキーで再送された場合は、最初の応答をそのまま返す
+        idempotency_key = data.get('idempotency_key') or request.headers.get('Idempotency-Key')
+        cache_key = f'phase_transition:{request.user.id}:{idempotency_key}' if idempotency_key else None
+        if cache_key:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return JsonResponse(cached)
+        
+        sessions = ReadingSession.objects.filter(student=request.user, text_id=text_id, text__is_active=True)
+        now = timezone.now()
+        applied = sessions.transition(phase, now) > 0
+        if applied:
+            current_phase = phase
+            # 同じ生徒が開いている他のタブにも反映する
+            phase_event_broker.publish(int(text_id), {
+                'phase': phase, 'student_ids': [request.user.id], 'changed_at': now.isoformat()
+            })
+        else:
+            # 移行しなかった場合だけ、セッションの有無と現在のフェーズを読み直す
+            current_phase = sessions.values_list('current_phase', flat=True).first()
+            if current_phase is None:
+                return JsonResponse({'success': False, 'error': 'Reading session not found'})
         
-        session.current_phase = 'answering'
-        session.reading_end_time = timezone.now()
-        session.answering_start_time = timezone.now()
-        session.save()
+        result = {
+            'success': True,
+            'current_phase': current_phase,
+            'applied': applied
+        }
+        if cache_key:
+            cache.add(cache_key, result, IDEMPOTENCY_KEY_TIMEOUT)
+        return JsonResponse(result)
         
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@login_required
+@csrf_exempt
+def transition_to_answering(request):
+    """解答フェーズへの移行"""
+    return _transition_phase(request, 'answering')
+
+@login_required
+@csrf_exempt
+def transition_to_reading(request):
+    """読解フェーズへの移行"""
+    return _transition_phase(request, 'reading')
+
+def _answering_session(user, text_id):
+    """解答フェーズ中の読解セッションを返す（該当しなければ None）"""
+    return ReadingSession.objects.filter(
+        student=user, text_id=text_id, text__is_active=True, current_phase='answering'
+    ).first()
+
+@login_required
+@csrf_exempt
+def autosave_response(request):
+    """回答を自動保存するAPI（同じ問題への回答は上書きする）"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST method required'})
+    
+    try:
+        data = json.loads(request.body)
+        text_id = get_question_text_id(data.get('question_id'))
+        if text_id is None:
+            return JsonResponse({'success': False, 'error': 'Question not found'})
+        session = _answering_session(request.user, text_id)
+        if session is None:
+            return JsonResponse({'success': False, 'error': 'Not in the answering phase'})
+        
+        response, = save_question_responses(session, [data])
         return JsonResponse({
             'success': True,
-            'session_id': session.id
+            'saved_at': response.updated_at.isoformat(),
+            'response_time': response.response_time.total_seconds() if response.response_time else None
         })
         
     except Exception as e:
@@ -632,31 +1156,96 @@ def transition_to_answering(request):
 
 @login_required
 @csrf_exempt
-def transition_to_reading(request):
-    """読解フェーズへの移行"""
+def submit_all_responses(request):
+    """文章の全ての回答を1つのトランザクションでまとめて保存するAPI"""
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'POST method required'})
     
     try:
         data = json.loads(request.body)
-        text_id = data.get('text_id')
+        answers = data.get('answers')
+        if not isinstance(answers, list):
+            return JsonResponse({'success': False, 'error': 'answers must be a list'})
         
-        text = get_object_or_404(Text, id=text_id, is_active=True)
-        session = get_object_or_404(ReadingSession, student=request.user, text=text)
+        session = _answering_session(request.user, data.get('text_id'))
+        if session is None:
+            return JsonResponse({'success': False, 'error': 'Not in the answering phase'})
         
-        session.current_phase = 'reading'
-        session.answering_end_time = timezone.now()
-        session.save()
+        with transaction.atomic():
+            responses = save_question_responses(session, answers)
         
         return JsonResponse({
             'success': True,
-            'session_id': session.id
+            'saved': len(responses),
+            'question_ids': [response.question_id for response in responses]
         })
         
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+def _authenticated_user(request):
+    return request.user if request.user.is_authenticated else None
+
+def _current_phase(student_id, text_id):
+    return ReadingSession.objects.filter(
+        student_id=student_id, text_id=text_id, text__is_active=True
+    ).values_list('current_phase', flat=True).first()
+
+def _sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+async def _phase_event_stream(student_id, text_id, phase):
+    queue = phase_event_broker.subscribe(text_id)
+    # ストリーミング中はクライアントの切断を検知できないため（ASGIハンドラーは http.disconnect を
+    # 見ず、切断後の送信もエラーにならない）、一定時間で応答を終えて購読を解除し、ブラウザに再接続させる
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.PHASE_EVENTS_STREAM_LIFETIME
+    try:
+        # 切断時はブラウザが5秒後に再接続する
+        yield 'retry: 5000\n\n' + _sse_event('phase', {'phase': phase})
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=min(settings.PHASE_EVENTS_HEARTBEAT, remaining))
+            except asyncio.TimeoutError:
+                # 他のプロセスで行われた変更は届かないため、一定時間ごとにデータベースも確認する
+                current = await sync_to_async(_current_phase)(student_id, text_id)
+                if current is not None and current != phase:
+                    phase = current
+                    yield _sse_event('phase', {'phase': phase})
+                else:
+                    yield ': keepalive\n\n'
+                continue
+            
+            if student_id in event['student_ids'] and event['phase'] != phase:
+                phase = event['phase']
+                yield _sse_event('phase', {'phase': phase, 'changed_at': event['changed_at']})
+    finally:
+        phase_event_broker.unsubscribe(text_id, queue)
+
+async def phase_events(request, text_id):
+    """フェーズ変更をServer-Sent Eventsで配信するAPI（生徒1人につき1本の接続）"""
+    user = await sync_to_async(_authenticated_user)(request)
+    if user is None:
+        return JsonResponse({'success': False, 'error': 'Login required'}, status=401)
+    
+    phase = await sync_to_async(_current_phase)(user.id, text_id)
+    if phase is None:
+        return JsonResponse({'success': False, 'error': 'Reading session not found'}, status=404)
+    
+    response = StreamingHttpResponse(
+        _phase_event_stream(user.id, text_id, phase),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # リバースプロキシにバッファリングさせない
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
+@versioned(_memos_version)
 def get_all_memos(request, text_id):
     """全てのメモ（段落定義＋分析コンテンツ）を取得"""
     try:
@@ -704,6 +1293,20 @@ def get_all_memos(request, text_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+
+def _activity_type_max_length():
+    return StudentActivityLog._meta.get_field('activity_type').max_length
+
+
+def _is_valid_activity_type(activity_type):
+    """活動タイプが保存できる値（空でない、列の長さ以内の文字列）か"""
+    return isinstance(activity_type, str) and 0 < len(activity_type) <= _activity_type_max_length()
+
+
+def _activity_type_error():
+    return f'activity_type must be a non-empty string of at most {_activity_type_max_length()} characters'
+
+
 @login_required
 @csrf_exempt
 def log_activity(request):
@@ -717,21 +1320,462 @@ def log_activity(request):
         activity_type = data.get('activity_type')
         details = data.get('details', {})
         
-        # ログを保存
-        log_entry = StudentActivityLog.objects.create(
-            student=request.user,
+        # 書き込みは後で行うため、保存できない値はここで拒否する（バッチ全体の書き込み失敗を防ぐ）
+        if not _is_valid_activity_type(activity_type):
+            return JsonResponse({'success': False, 'error': _activity_type_error()})
+        if text_id and not Text.objects.filter(id=text_id).exists():
+            return JsonResponse({'success': False, 'error': 'Text not found'})
+        
+        log_entry = StudentActivityLog(
+            student_id=request.user.id,
             text_id=text_id if text_id else None,
             activity_type=activity_type,
-            details=details
+            details=details,
+            timestamp=timezone.now()
         )
         
+        # ログはキューに積み、書き込みはバックグラウンドで行う
+        return _queue_activity_logs([log_entry])
+        
+    except Exception as e:
         return JsonResponse({
-            'success': True,
-            'log_id': log_entry.id
+            'success': False,
+            'error': str(e)
         })
+
+
+@login_required
+@csrf_exempt
+def log_activity_batch(request):
+    """学習活動ログを一括で記録するAPI"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST method required'})
+    
+    try:
+        data = json.loads(request.body)
+        events = data.get('events', [])
+        
+        if not isinstance(events, list):
+            return JsonResponse({'success': False, 'error': 'events must be a list'})
+        if len(events) > settings.ACTIVITY_LOG_MAX_BATCH:
+            return JsonResponse({
+                'success': False,
+                'error': f'too many events (max {settings.ACTIVITY_LOG_MAX_BATCH})'
+            })
+        
+        # 存在する文章IDを1クエリで確認（不正なIDで一括INSERT全体が失敗しないように）
+        text_ids = {event.get('text_id') for event in events if isinstance(event, dict) and event.get('text_id')}
+        valid_text_ids = {
+            str(text_id) for text_id in Text.objects.filter(id__in=text_ids).values_list('id', flat=True)
+        } if text_ids else set()
+        
+        now = timezone.now()
+        log_entries = []
+        for event in events:
+            if not isinstance(event, dict) or not _is_valid_activity_type(event.get('activity_type')):
+                continue
+            text_id = event.get('text_id')
+            if text_id and str(text_id) not in valid_text_ids:
+                continue
+            log_entries.append(
+                StudentActivityLog(
+                    student_id=request.user.id,
+                    text_id=text_id if text_id else None,
+                    activity_type=event['activity_type'],
+                    details=event.get('details', {}),
+                    timestamp=now
+                )
+            )
+        
+        return _queue_activity_logs(log_entries, skipped=len(events) - len(log_entries))
         
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': str(e)
         })
+
+
+def _queue_activity_logs(log_entries, **extra):
+    """活動ログをライトビハインドキューに積み、202（満杯時は503）を返す"""
+    if not write_activity_logs(log_entries):
+        response = JsonResponse({
+            'success': False,
+            'error': 'activity log queue is full'
+        }, status=503)
+        response['Retry-After'] = '5'
+        return response
+    
+    return JsonResponse({
+        'success': True,
+        'count': len(log_entries),
+        **extra
+    }, status=202)
+
+
+@teacher_required
+@csrf_exempt
+def provision_reading_sessions(request, text_id):
+    """生徒の読解セッションを一括作成するAPI（student_ids 省略時は全ての生徒）"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST method required'})
+    
+    try:
+        text = _teacher_text(request, text_id)
+        data = json.loads(request.body)
+        student_ids = data.get('student_ids')
+        if student_ids is not None and not isinstance(student_ids, list):
+            return JsonResponse({'success': False, 'error': 'student_ids must be a list'})
+        
+        created = create_reading_sessions(text, student_ids)
+        return JsonResponse({
+            'success': True,
+            'created': created,
+            'total': ReadingSession.objects.filter(text=text).count()
+        })
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+@csrf_exempt
+def set_class_phase(request, text_id):
+    """生徒全員（または指定した生徒）のフェーズを一括で変更し、接続中の生徒に配信するAPI"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'POST method required'})
+    
+    try:
+        text = _teacher_text(request, text_id)
+        data = json.loads(request.body)
+        phase = data.get('phase')
+        student_ids = data.get('student_ids')
+        if student_ids is not None and not isinstance(student_ids, list):
+            return JsonResponse({'success': False, 'error': 'student_ids must be a list'})
+        
+        if phase not in PHASE_TRANSITIONS:
+            return JsonResponse({'success': False, 'error': 'phase must be reading or answering'})
+        
+        from_phase = PHASE_TRANSITIONS[phase][0]
+        sessions = ReadingSession.objects.filter(text=text, current_phase=from_phase)
+        if student_ids is not None:
+            sessions = sessions.filter(student_id__in=student_ids)
+        
+        now = timezone.now()
+        with transaction.atomic():
+            changed = list(sessions.select_for_update().values_list('student_id', flat=True))
+            ReadingSession.objects.filter(text=text, student_id__in=changed).transition(phase, now)
+            
+            # コミット後に接続中の生徒へ配信する
+            event = {'phase': phase, 'student_ids': changed, 'changed_at': now.isoformat()}
+            transaction.on_commit(lambda: phase_event_broker.publish(text.id, event))
+        
+        return JsonResponse({'success': True, 'updated': len(changed)})
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+def activity_summary(request, text_id):
+    """文章ごとの活動ログ集計を取得するAPI（日次集計テーブルから読む）"""
+    try:
+        text = _teacher_text(request, text_id)
+        rollups = ActivityDailyRollup.objects.filter(text=text)
+        
+        since = request.GET.get('since')
+        if since:
+            since_day = parse_date(since)
+            if since_day is None:
+                return JsonResponse({'success': False, 'error': 'since must be YYYY-MM-DD'})
+            rollups = rollups.filter(day__gte=since_day)
+        
+        # 日別・活動タイプ別の件数
+        daily = rollups.values('day', 'activity_type').annotate(count=Sum('count')).order_by('day', 'activity_type')
+        
+        # 生徒別・活動タイプ別の件数
+        per_student = rollups.values(
+            'student_id', 'student__username', 'activity_type'
+        ).annotate(count=Sum('count')).order_by('student__username', 'activity_type')
+        
+        return JsonResponse({
+            'success': True,
+            'daily': [
+                {
+                    'day': row['day'].isoformat(),
+                    'activity_type': row['activity_type'],
+                    'count': row['count']
+                }
+                for row in daily
+            ],
+            'students': [
+                {
+                    'student_id': row['student_id'],
+                    'username': row['student__username'],
+                    'activity_type': row['activity_type'],
+                    'count': row['count']
+                }
+                for row in per_student
+            ]
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+def proctoring_counters(request, text_id):
+    """生徒ごとの不正操作カウンターを取得するAPI（カウンターテーブルを1クエリで読む）"""
+    try:
+        text = _teacher_text(request, text_id)
+        counters = ActivityCounter.objects.filter(text=text).values(
+            'student_id', 'student__username', 'activity_type', 'count', 'last_activity_at'
+        ).order_by('student__username')
+        
+        students = {}
+        for counter in counters:
+            student = students.setdefault(counter['student_id'], {
+                'student_id': counter['student_id'],
+                'username': counter['student__username'],
+                'counts': {},
+                'last_activity_at': None
+            })
+            student['counts'][counter['activity_type']] = counter['count']
+            if counter['last_activity_at']:
+                last_activity_at = counter['last_activity_at'].isoformat()
+                student['last_activity_at'] = max(student['last_activity_at'] or '', last_activity_at)
+        
+        return JsonResponse({
+            'success': True,
+            'students': list(students.values())
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+def class_progress(request):
+    """生徒 × 文章の進捗（フェーズ・読解時間・回答数・最終活動時刻）を取得するAPI（?text=<id> で絞り込み、複数指定可）"""
+    try:
+        text_ids = request.GET.getlist('text')
+        if not all(text_id.isdigit() for text_id in text_ids):
+            return JsonResponse({'success': False, 'error': 'text must be an integer id'})
+        
+        return JsonResponse({
+            'success': True,
+            **build_class_progress(request.user, [int(text_id) for text_id in text_ids])
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+def highlight_heatmap(request, text_id):
+    """クラス全体のハイライト分布を取得するAPI"""
+    try:
+        text = _teacher_text(request, text_id)
+        
+        try:
+            bucket_size = int(request.GET.get('bucket', 1))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'bucket must be an integer'})
+        if bucket_size < 1:
+            return JsonResponse({'success': False, 'error': 'bucket must be positive'})
+        
+        return JsonResponse({
+            'success': True,
+            'heatmap': build_highlight_heatmap(text, bucket_size)
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+def session_scores(request, text_id):
+    """選択問題の採点結果を取得するAPI（?regrade=1 で文章全体を採点し直してから返す）"""
+    try:
+        text = _teacher_text(request, text_id)
+        if request.GET.get('regrade') == '1':
+            grade_text(text.id)
+        
+        scores = SessionScore.objects.filter(session__text=text).order_by('session__student__username').values(
+            'session__student_id', 'session__student__username', 'session__current_phase',
+            'question_count', 'answered_count', 'correct_count', 'score', 'updated_at'
+        )
+        return JsonResponse({
+            'success': True,
+            'scores': [
+                {
+                    'student_id': row['session__student_id'],
+                    'username': row['session__student__username'],
+                    'current_phase': row['session__current_phase'],
+                    'question_count': row['question_count'],
+                    'answered_count': row['answered_count'],
+                    'correct_count': row['correct_count'],
+                    'score': row['score'],
+                    'graded_at': row['updated_at'].isoformat(),
+                }
+                for row in scores
+            ]
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+def item_analysis(request, text_id):
+    """選択問題の項目分析（困難度・識別力・選択肢ごとの選択率）を取得するAPI"""
+    try:
+        text = _teacher_text(request, text_id)
+        return JsonResponse({
+            'success': True,
+            'analysis': build_item_analysis(text.id)
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@teacher_required
+def essay_clusters(request, text_id):
+    """記述問題ごとに、互いに似ている回答のクラスタを取得するAPI（?question=<id> で1問に絞る）"""
+    try:
+        text = _teacher_text(request, text_id)
+        questions = [question for question in get_exam_paper(text.id)['questions'] if question['question_type'] == 'essay']
+        
+        question_id = request.GET.get('question')
+        if question_id:
+            if not question_id.isdigit():
+                return JsonResponse({'success': False, 'error': 'question must be an integer id'})
+            questions = [question for question in questions if question['id'] == int(question_id)]
+        
+        threshold = request.GET.get('threshold')
+        if threshold is not None:
+            try:
+                threshold = float(threshold)
+            except ValueError:
+                return JsonResponse({'success': False, 'error': 'threshold must be a number'})
+            if not 0 < threshold <= 1:
+                return JsonResponse({'success': False, 'error': 'threshold must be between 0 and 1'})
+        
+        refresh_stale_signatures([question['id'] for question in questions])
+        return JsonResponse({
+            'success': True,
+            'questions': [
+                {
+                    'question_id': question['id'],
+                    'order': question['order'],
+                    'question_text': question['question_text'],
+                    **build_essay_clusters(question['id'], threshold)
+                }
+                for question in questions
+            ]
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+def _serialize_calibration_summary(summary):
+    return {
+        'response_count': summary['response_count'],
+        'graded_count': summary['graded_count'],
+        'accuracy': summary['accuracy'],
+        'mean_confidence': summary['mean_confidence'],
+        'overconfidence': summary['overconfidence'],
+        'brier_score': summary['brier_score'],
+        'calibration': [
+            {'confidence_level': level, 'count': count, 'correct': correct}
+            for level, (count, correct) in enumerate(summary['calibration'], start=1)
+        ],
+        'response_time': {
+            'p25': summary['time_p25'],
+            'p50': summary['time_p50'],
+            'p75': summary['time_p75'],
+            'p90': summary['time_p90'],
+        },
+    }
+
+@teacher_required
+def calibration_summary(request, text_id):
+    """確信度の較正と回答時間の集計を取得するAPI（?refresh=1 で集計し直してから返す）"""
+    try:
+        text = _teacher_text(request, text_id)
+        if request.GET.get('refresh') == '1':
+            summarize_text(text.id)
+        
+        summaries = CalibrationSummary.objects.filter(text=text).order_by(
+            'scope', 'student__username', 'question__order', 'question_id'
+        ).values(
+            'scope', 'student_id', 'student__username', 'question_id', 'question__order',
+            'response_count', 'graded_count', 'accuracy', 'mean_confidence', 'overconfidence',
+            'brier_score', 'calibration', 'time_p25', 'time_p50', 'time_p75', 'time_p90', 'updated_at'
+        )
+        
+        overall = None
+        students = []
+        questions = []
+        for summary in summaries:
+            if summary['scope'] == 'text':
+                overall = _serialize_calibration_summary(summary)
+            elif summary['scope'] == 'student':
+                students.append({
+                    'student_id': summary['student_id'],
+                    'username': summary['student__username'],
+                    **_serialize_calibration_summary(summary)
+                })
+            else:
+                questions.append({
+                    'question_id': summary['question_id'],
+                    'order': summary['question__order'],
+                    **_serialize_calibration_summary(summary)
+                })
+        
+        return JsonResponse({
+            'success': True,
+            'summarized_at': summaries[0]['updated_at'].isoformat() if summaries else None,
+            'overall': overall,
+            'students': students,
+            'questions': questions
+        })
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)})
+
+@staff_or_teacher_required
+def export_data(request, kind):
+    """活動ログ・回答・注釈をCSV/NDJSONでストリーミング出力するAPI"""
+    if kind not in EXPORTS:
+        return JsonResponse({'success': False, 'error': f'unknown export: {kind}'}, status=404)
+    
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return JsonResponse({'success': False, 'error': 'format must be csv or ndjson'})
+    
+    # ストリーミング開始後にはエラーを返せないため、絞り込み条件は先に検証する
+    for key in ('text', 'student'):
+        value = request.GET.get(key)
+        if value and not value.isdigit():
+            return JsonResponse({'success': False, 'error': f'{key} must be an integer id'})
+    
+    # 日付での絞り込み（until は指定日を含む）
+    date_range = {}
+    for key in ('since', 'until'):
+        value = request.GET.get(key)
+        if not value:
+            continue
+        day = parse_date(value)
+        if day is None:
+            return JsonResponse({'success': False, 'error': f'{key} must be YYYY-MM-DD'})
+        if key == 'until':
+            day += timedelta(days=1)
+        date_range[key] = timezone.make_aware(datetime.combine(day, time.min))
+    
+    queryset = build_export_queryset(
+        kind,
+        text_id=request.GET.get('text'),
+        student_id=request.GET.get('student'),
+        **date_range
+    )
+    
+    if export_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(kind, queryset), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(stream_ndjson(kind, queryset), content_type='application/x-ndjson; charset=utf-8')
+    
+    filename = f"{kind}-{timezone.localdate():%Y%m%d}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -144,3 +144,53 @@ LOGGING = {
         'level': 'INFO',
     },
 }
+
+# 活動ログ設定
+# 一括記録APIが1リクエストで受け付けるイベント数の上限
+ACTIVITY_LOG_MAX_BATCH = config('ACTIVITY_LOG_MAX_BATCH', default=200, cast=int)
+
+# ライトビハインド書き込み（ログAPIはキューに積んで即座に202を返す）
+ACTIVITY_LOG_WRITE_BEHIND = config('ACTIVITY_LOG_WRITE_BEHIND', default=True, cast=bool)
+# キューに保持できるイベント数の上限（超えるとAPIは503を返す）
+ACTIVITY_LOG_QUEUE_SIZE = config('ACTIVITY_LOG_QUEUE_SIZE', default=10000, cast=int)
+# フラッシュ間隔（秒）と1トランザクションで書き込む件数
+ACTIVITY_LOG_FLUSH_INTERVAL = config('ACTIVITY_LOG_FLUSH_INTERVAL', default=1.0, cast=float)
+ACTIVITY_LOG_FLUSH_BATCH_SIZE = config('ACTIVITY_LOG_FLUSH_BATCH_SIZE', default=500, cast=int)
+# キューが満杯のときに空きを待つ最大時間（秒）
+ACTIVITY_LOG_ENQUEUE_TIMEOUT = config('ACTIVITY_LOG_ENQUEUE_TIMEOUT', default=0.5, cast=float)
+# 生ログの保持日数（rollup_activity_logs --prune で古い生ログを削除する。0で無期限）
+ACTIVITY_LOG_RETENTION_DAYS = config('ACTIVITY_LOG_RETENTION_DAYS', default=90, cast=int)
+
+# 文章一覧・本文API設定
+# ダッシュボードの文章一覧の1ページあたりの件数
+TEXT_LIST_PAGE_SIZE = config('TEXT_LIST_PAGE_SIZE', default=20, cast=int)
+# 本文APIが1回に返す最大文字数
+TEXT_CONTENT_MAX_CHUNK = config('TEXT_CONTENT_MAX_CHUNK', default=20000, cast=int)
+
+# フェーズ変更の配信（SSE）設定
+# キープアライブを送る間隔（秒）。この間隔で他のプロセスでの変更もデータベースから確認する
+PHASE_EVENTS_HEARTBEAT = config('PHASE_EVENTS_HEARTBEAT', default=15, cast=int)
+# 1本の接続を保つ最大秒数。切断されたタブの接続が残り続けないよう、この時間で閉じて再接続させる
+PHASE_EVENTS_STREAM_LIFETIME = config('PHASE_EVENTS_STREAM_LIFETIME', default=300, cast=int)
+
+# 問題冊子キャッシュ設定
+# 変更時はシグナルで無効化する。プロセスごとのキャッシュ（LocMem）では他のプロセスに
+# 無効化が届かないため、この秒数で期限切れにする
+EXAM_PAPER_CACHE_TIMEOUT = config('EXAM_PAPER_CACHE_TIMEOUT', default=300, cast=int)
+
+# 記述回答の類似検出設定
+# 推定類似度（文字n-gramのJaccard係数）がこの値以上の回答の組を疑わしいとみなす
+ESSAY_SIMILARITY_THRESHOLD = config('ESSAY_SIMILARITY_THRESHOLD', default=0.6, cast=float)
+# 空白を除いた文字数がこれより短い回答は偶然一致しやすいため比較しない
+ESSAY_SIMILARITY_MIN_LENGTH = config('ESSAY_SIMILARITY_MIN_LENGTH', default=30, cast=int)
+
+# クラス進捗ボード設定
+# 進捗APIの結果をキャッシュする秒数（試験中に複数の教員画面が数秒おきに読むため）
+CLASS_PROGRESS_CACHE_TIMEOUT = config('CLASS_PROGRESS_CACHE_TIMEOUT', default=5, cast=int)
+
+# 生徒管理設定
+# 生徒一覧の1ページあたりの件数
+STUDENT_LIST_PAGE_SIZE = config('STUDENT_LIST_PAGE_SIZE', default=50, cast=int)
+# 生徒数のキャッシュの有効期間（秒）。生徒の追加・削除時はシグナルで数え直すが、
+# プロセスごとのキャッシュ（LocMem）では他のプロセスに届かないため期限を設ける
+STUDENT_COUNT_CACHE_TIMEOUT = config('STUDENT_COUNT_CACHE_TIMEOUT', default=300, cast=int)
@@ -246,8 +246,7 @@ class ActiveReadingTools {
     }
 
     loadUserParagraphs() {
-        fetch(`/api/get-paragraph-definitions/${this.textId}/`)
-            .then(response => response.json())
+        window.textBootstrap.load(this.textId)
             .then(data => {
                 if (data.success) {
                     this.userParagraphs = data.paragraphs;
@@ -266,8 +265,22 @@ class ActiveReadingTools {
         this.setupParagraphs();
         this.setupToolbar();
         this.setupEventListeners();
-        this.loadActiveReadingContent();
-        // updateRightSidebarDisplay() は loadActiveReadingContent() の完了後に呼ばれる
+        this.loadInitialContent();
+        // updateRightSidebarDisplay() は初期データの読み込み完了後に呼ばれる
+    }
+
+    loadInitialContent() {
+        // 初回はページの初期データを使い、保存・削除後は loadActiveReadingContent() で再取得する
+        window.textBootstrap.load(this.textId)
+            .then(data => {
+                if (data.success) {
+                    this.activeReadingContent = data.active_reading_content;
+                    this.updateRightSidebarDisplay();
+                }
+            })
+            .catch(error => {
+                console.error('コンテンツ読み込みエラー:', error);
+            });
     }
 
 
@@ -1007,8 +1020,7 @@ class ActiveReadingTools {
     }
 
     loadActiveReadingContent() {
-        fetch(`/api/get-active-reading-content/${this.textId}/`)
-            .then(response => response.json())
+        window.apiCache.fetchJson(`/api/get-active-reading-content/${this.textId}/`)
             .then(data => {
                 if (data.success) {
                     this.activeReadingContent = data.content;
@@ -1237,6 +1249,10 @@ class ActiveReadingTools {
         return labels[type] || type;
     }
 
+    getTextOffset(node, offset) {
+        return window.textOffsetIndex.offsetOf(node, offset);
+    }
+
     getCsrfToken() {
         return document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
     }
@@ -0,0 +1,201 @@
+class AnnotationHighlighter {
+    constructor(textContent, sync) {
+        this.textContent = textContent;
+        this.sync = sync;
+        this.highlights = new Map();  // 注釈ID（サーバーIDの確定前はクライアントID）→ 文字位置の区間
+        this.selection = null;
+        this.overlay = null;
+        this.init();
+    }
+
+    init() {
+        this.sync.onSynced(idMap => this.remapIds(idMap));
+        this.sync.onRejected(clientIds => this.dropRejected(clientIds));
+
+        this.textContent.addEventListener('mouseup', (e) => {
+            this.handleTextSelection(e);
+        });
+
+        document.addEventListener('click', (e) => {
+            if (e.target.classList.contains('add-highlight-btn')) {
+                e.preventDefault();
+                this.addHighlight();
+            }
+            if (e.target.classList.contains('remove-highlight-btn')) {
+                e.preventDefault();
+                this.removeHighlights();
+            }
+        });
+
+        // 段落の枠や画面幅の変化で文字の位置が変わったら描き直す
+        if (window.ResizeObserver) {
+            new ResizeObserver(() => this.render()).observe(this.textContent);
+        }
+
+        window.textBootstrap.load(this.sync.textId)
+            .then(data => {
+                if (!data.success) return;
+                data.annotations
+                    .filter(annotation => annotation.type === 'highlight')
+                    .forEach(annotation => {
+                        this.highlights.set(annotation.id, {
+                            start: annotation.start_position,
+                            end: annotation.end_position
+                        });
+                    });
+                this.render();
+            })
+            .catch(error => {
+                console.error('注釈読み込みエラー:', error);
+            });
+    }
+
+    handleTextSelection(e) {
+        // 段落番号付与モードの選択は段落の追加に使う
+        if (this.textContent.classList.contains('paragraph-selection-mode')) return;
+
+        const selection = window.getSelection();
+        if (selection.toString().length === 0) {
+            this.hideMenu();
+            return;
+        }
+
+        const range = selection.getRangeAt(0);
+        const start = window.textOffsetIndex.offsetOf(range.startContainer, range.startOffset);
+        const end = window.textOffsetIndex.offsetOf(range.endContainer, range.endOffset);
+        if (start >= end) return;
+
+        this.selection = { start, end };
+        this.showMenu(e.pageX, e.pageY);
+    }
+
+    overlapping(start, end) {
+        return Array.from(this.highlights.entries())
+            .filter(([, highlight]) => highlight.start < end && start < highlight.end)
+            .map(([id]) => id);
+    }
+
+    showMenu(x, y) {
+        this.hideMenu();
+
+        const menu = document.createElement('div');
+        menu.className = 'annotation-menu';
+        menu.style.cssText = `
+            position: absolute;
+            left: ${Math.min(x, window.innerWidth - 200)}px;
+            top: ${y}px;
+            z-index: 1000;
+            background-color: white;
+            border: 1px solid #ccc;
+            border-radius: 4px;
+            padding: 8px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+        `;
+
+        const canRemove = this.overlapping(this.selection.start, this.selection.end).length > 0;
+        menu.innerHTML = `
+            <div class="btn-group" role="group">
+                <button type="button" class="btn btn-sm btn-warning add-highlight-btn">🖍 ハイライト</button>
+                ${canRemove ? '<button type="button" class="btn btn-sm btn-outline-secondary remove-highlight-btn">解除</button>' : ''}
+            </div>
+        `;
+        document.body.appendChild(menu);
+    }
+
+    hideMenu() {
+        document.querySelector('.annotation-menu')?.remove();
+    }
+
+    addHighlight() {
+        this.hideMenu();
+        if (!this.selection) return;
+
+        const { start, end } = this.selection;
+        const id = this.sync.create({
+            annotation_type: 'highlight',
+            start_position: start,
+            end_position: end
+        });
+        this.highlights.set(id, { start, end });
+        this.selection = null;
+        window.getSelection().removeAllRanges();
+        this.render();
+    }
+
+    removeHighlights() {
+        this.hideMenu();
+        if (!this.selection) return;
+
+        this.overlapping(this.selection.start, this.selection.end).forEach(id => {
+            this.sync.delete(id);
+            this.highlights.delete(id);
+        });
+        this.selection = null;
+        window.getSelection().removeAllRanges();
+        this.render();
+    }
+
+    // 作成した注釈のクライアントIDをサーバーIDに置き換える
+    remapIds(idMap) {
+        Object.entries(idMap || {}).forEach(([clientId, serverId]) => {
+            const highlight = this.highlights.get(clientId);
+            if (!highlight) return;
+            this.highlights.delete(clientId);
+            this.highlights.set(serverId, highlight);
+        });
+    }
+
+    // 保存されなかったハイライトは表示から消して知らせる
+    dropRejected(clientIds) {
+        const dropped = clientIds.filter(id => this.highlights.delete(id));
+        if (dropped.length === 0) return;
+        this.render();
+        alert('ハイライトを保存できませんでした。もう一度選択してください。');
+    }
+
+    render() {
+        if (this.overlay) {
+            this.overlay.remove();
+            this.overlay = null;
+        }
+        if (this.highlights.size === 0) return;
+
+        // 段落の表示が本文のDOMを書き換えるため、ハイライトは上に重ねたレイヤーに描く
+        this.textContent.style.position = 'relative';
+        this.overlay = document.createElement('div');
+        this.overlay.className = 'annotation-highlight-overlay';
+        this.overlay.style.cssText = 'position: absolute; top: 0; left: 0; width: 100%; height: 100%; pointer-events: none;';
+        this.textContent.appendChild(this.overlay);
+
+        const origin = this.textContent.getBoundingClientRect();
+        const fragment = document.createDocumentFragment();
+        this.highlights.forEach(({ start, end }) => {
+            window.textOffsetIndex.slices(start, end).forEach(slice => {
+                const range = document.createRange();
+                range.setStart(slice.node, slice.start);
+                range.setEnd(slice.node, slice.end);
+                Array.from(range.getClientRects()).forEach(rect => {
+                    const box = document.createElement('div');
+                    box.style.cssText = `
+                        position: absolute;
+                        left: ${rect.left - origin.left}px;
+                        top: ${rect.top - origin.top}px;
+                        width: ${rect.width}px;
+                        height: ${rect.height}px;
+                        background-color: rgba(255, 214, 0, 0.35);
+                    `;
+                    fragment.appendChild(box);
+                });
+            });
+        });
+        this.overlay.appendChild(fragment);
+    }
+}
+
+// ページ読み込み時に初期化（注釈同期の初期化より後に実行される）
+document.addEventListener('DOMContentLoaded', () => {
+    const textContent = document.querySelector('.text-content');
+    if (textContent && window.annotationSync) {
+        new AnnotationHighlighter(textContent, window.annotationSync);
+    }
+});
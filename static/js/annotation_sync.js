@@ -0,0 +1,214 @@
+class AnnotationSync {
+    constructor(textId) {
+        this.textId = textId;
+        this.creates = new Map();   // クライアントID → 作成内容
+        this.updates = new Map();   // サーバーID → 更新内容
+        this.deletes = new Set();   // サーバーID
+        this.inflight = new Map();  // 送信中の作成のクライアントID → 送信後に行われた変更
+        this.serverIds = new Map(); // 作成済みのクライアントID → サーバーID
+        this.nextClientId = 1;
+        this.flushDelay = 1000;
+        this.flushTimer = null;
+        this.listeners = [];
+        this.rejectListeners = [];
+        this.init();
+    }
+
+    init() {
+        // ページ離脱時は未送信の変更を sendBeacon で送る
+        window.addEventListener('pagehide', () => {
+            this.flush(true);
+        });
+    }
+
+    isClientId(id) {
+        return typeof id === 'string' && id.startsWith('c-');
+    }
+
+    // サーバーIDが確定したクライアントIDはサーバーIDに読み替える
+    resolve(id) {
+        return this.serverIds.get(id) || id;
+    }
+
+    // 注釈を作成し、サーバーIDが確定するまで使うクライアントIDを返す
+    create(annotation) {
+        const clientId = `c-${Date.now()}-${this.nextClientId++}`;
+        this.creates.set(clientId, {
+            client_id: clientId,
+            annotation_type: annotation.annotation_type,
+            start_position: annotation.start_position,
+            end_position: annotation.end_position,
+            content: annotation.content || ''
+        });
+        this.scheduleFlush();
+        return clientId;
+    }
+
+    update(id, fields) {
+        id = this.resolve(id);
+        if (this.isClientId(id)) {
+            // 未送信の作成はその内容を書き換えるだけでよい
+            const pending = this.creates.get(id);
+            if (pending) {
+                Object.assign(pending, fields);
+            } else if (this.inflight.has(id)) {
+                // 送信中の作成はサーバーIDが返るまで変更を保留する
+                Object.assign(this.inflight.get(id).fields, fields);
+                return;
+            }
+        } else {
+            this.updates.set(id, Object.assign(this.updates.get(id) || { id: id }, fields));
+        }
+        this.scheduleFlush();
+    }
+
+    delete(id) {
+        id = this.resolve(id);
+        if (this.isClientId(id)) {
+            this.creates.delete(id);
+            if (this.inflight.has(id)) {
+                this.inflight.get(id).deleted = true;
+                return;
+            }
+        } else {
+            this.updates.delete(id);
+            this.deletes.add(id);
+        }
+        this.scheduleFlush();
+    }
+
+    // 同期完了時に { clientId: serverId } の対応を受け取る
+    onSynced(listener) {
+        this.listeners.push(listener);
+    }
+
+    // サーバーが保存しなかった作成のクライアントIDの一覧を受け取る
+    onRejected(listener) {
+        this.rejectListeners.push(listener);
+    }
+
+    notifyRejected(clientIds) {
+        if (clientIds.length > 0) this.rejectListeners.forEach(listener => listener(clientIds));
+    }
+
+    scheduleFlush() {
+        clearTimeout(this.flushTimer);
+        this.flushTimer = setTimeout(() => this.flush(), this.flushDelay);
+    }
+
+    hasPendingChanges() {
+        return this.creates.size > 0 || this.updates.size > 0 || this.deletes.size > 0;
+    }
+
+    takeChangeset() {
+        const changeset = {
+            text_id: this.textId,
+            creates: Array.from(this.creates.values()),
+            updates: Array.from(this.updates.values()),
+            deletes: Array.from(this.deletes)
+        };
+        this.creates.clear();
+        this.updates.clear();
+        this.deletes.clear();
+        return changeset;
+    }
+
+    // 送信した作成のサーバーIDが確定したら、送信中に保留した変更をサーバーIDに付け替えて送る
+    applyIdMap(changeset, idMap) {
+        changeset.creates.forEach(create => {
+            const pending = this.inflight.get(create.client_id);
+            this.inflight.delete(create.client_id);
+            const serverId = idMap[create.client_id];
+            if (!serverId || !pending) return;
+
+            this.serverIds.set(create.client_id, serverId);
+            if (pending.deleted) {
+                this.deletes.add(serverId);
+            } else if (Object.keys(pending.fields).length > 0) {
+                this.updates.set(serverId, Object.assign({ id: serverId }, pending.fields));
+            }
+        });
+        if (this.hasPendingChanges()) this.scheduleFlush();
+    }
+
+    // サーバーが拒否した変更は破棄し、保留していた変更も捨てる
+    discardChangeset(changeset) {
+        changeset.creates.forEach(create => this.inflight.delete(create.client_id));
+        this.notifyRejected(changeset.creates.map(create => create.client_id));
+    }
+
+    restoreChangeset(changeset) {
+        // 送信に失敗した変更を、その後に行われた変更より前の状態として戻す
+        changeset.creates.forEach(create => {
+            const pending = this.inflight.get(create.client_id);
+            this.inflight.delete(create.client_id);
+            if (pending && pending.deleted) return;
+            if (!this.creates.has(create.client_id)) {
+                this.creates.set(create.client_id, Object.assign(create, pending ? pending.fields : {}));
+            }
+        });
+        changeset.updates.forEach(update => {
+            if (!this.deletes.has(update.id)) {
+                this.updates.set(update.id, Object.assign({}, update, this.updates.get(update.id)));
+            }
+        });
+        changeset.deletes.forEach(id => this.deletes.add(id));
+    }
+
+    flush(useBeacon = false) {
+        clearTimeout(this.flushTimer);
+        if (!this.hasPendingChanges()) return Promise.resolve({});
+
+        const changeset = this.takeChangeset();
+        const body = JSON.stringify(changeset);
+
+        if (useBeacon && navigator.sendBeacon) {
+            const blob = new Blob([body], { type: 'application/json' });
+            if (navigator.sendBeacon('/api/sync-annotations/', blob)) return Promise.resolve({});
+        }
+        changeset.creates.forEach(create => {
+            this.inflight.set(create.client_id, { fields: {}, deleted: false });
+        });
+
+        return fetch('/api/sync-annotations/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCsrfToken()
+            },
+            body: body,
+            keepalive: useBeacon
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                console.error('注釈同期エラー:', data.error);
+                this.discardChangeset(changeset);
+                return {};
+            }
+            this.applyIdMap(changeset, data.id_map);
+            this.listeners.forEach(listener => listener(data.id_map));
+            // 不正な項目だけが保存されずに返される（他の変更は反映済み）
+            (data.rejected || []).forEach(item => console.error('注釈を保存できませんでした:', item.error));
+            this.notifyRejected((data.rejected || []).filter(item => item.client_id).map(item => item.client_id));
+            return data.id_map;
+        })
+        .catch(error => {
+            console.error('注釈同期エラー:', error);
+            this.restoreChangeset(changeset);
+            return {};
+        });
+    }
+
+    getCsrfToken() {
+        return document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
+    }
+}
+
+// ページ読み込み時に初期化
+document.addEventListener('DOMContentLoaded', () => {
+    const textId = document.querySelector('[data-text-id]')?.getAttribute('data-text-id');
+    if (textId) {
+        window.annotationSync = new AnnotationSync(textId);
+    }
+});
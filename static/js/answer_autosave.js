@@ -0,0 +1,174 @@
+class AnswerAutosave {
+    constructor(form) {
+        this.form = form;
+        this.questionId = form.dataset.questionId;
+        this.textId = form.dataset.textId;
+        this.status = document.getElementById('autosave-status');
+        this.debounceDelay = 2000;
+        this.saveTimer = null;
+        this.pendingKey = `pending-answers:${this.textId}`; // 送信できなかった回答（問題ID → 回答）
+        this.init();
+    }
+
+    init() {
+        // 前回送信できなかったこの問題の回答があれば、フォームに戻してから送り直す
+        const pending = this.readPending()[this.questionId];
+        if (pending) this.restore(pending);
+        this.lastSaved = JSON.stringify(this.collect());
+        this.flushPending();
+
+        // 記述は入力が止まってから、選択肢と確信度は変更時にすぐ保存する
+        this.form.addEventListener('input', (e) => {
+            if (e.target.tagName === 'TEXTAREA') this.scheduleSave();
+        });
+        this.form.addEventListener('change', (e) => {
+            if (e.target.tagName !== 'TEXTAREA') this.save();
+        });
+        this.form.addEventListener('submit', () => {
+            clearTimeout(this.saveTimer);
+        });
+        window.addEventListener('pagehide', () => this.save(true));
+        window.addEventListener('online', () => this.flushPending());
+    }
+
+    collect() {
+        const textarea = this.form.querySelector('[name=response_text]');
+        const choice = this.form.querySelector('[name=selected_choice]:checked');
+        const confidence = this.form.querySelector('[name=confidence_level]');
+        return {
+            question_id: this.questionId,
+            response_text: textarea ? textarea.value : '',
+            selected_choice_id: choice ? choice.value : null,
+            confidence_level: confidence ? confidence.value : 3
+        };
+    }
+
+    restore(answer) {
+        const textarea = this.form.querySelector('[name=response_text]');
+        if (textarea) textarea.value = answer.response_text;
+        const choice = this.form.querySelector(`[name=selected_choice][value="${answer.selected_choice_id}"]`);
+        if (choice) choice.checked = true;
+        const confidence = this.form.querySelector('[name=confidence_level]');
+        if (confidence) confidence.value = answer.confidence_level;
+    }
+
+    scheduleSave() {
+        clearTimeout(this.saveTimer);
+        this.setStatus('未保存の変更があります');
+        this.saveTimer = setTimeout(() => this.save(), this.debounceDelay);
+    }
+
+    save(useBeacon = false) {
+        clearTimeout(this.saveTimer);
+        const answer = this.collect();
+        const body = JSON.stringify(answer);
+        if (body === this.lastSaved) return;
+
+        if (useBeacon && navigator.sendBeacon) {
+            const blob = new Blob([body], { type: 'application/json' });
+            if (navigator.sendBeacon('/api/autosave-response/', blob)) return;
+        }
+
+        fetch('/api/autosave-response/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCsrfToken()
+            },
+            body: body,
+            keepalive: useBeacon
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                this.lastSaved = body;
+                this.removePending([this.questionId]);
+                this.setStatus(`自動保存しました（${new Date(data.saved_at).toLocaleTimeString('ja-JP')}）`);
+            } else {
+                this.setStatus('保存できませんでした: ' + data.error);
+            }
+        })
+        .catch(error => {
+            console.error('回答の自動保存エラー:', error);
+            this.storePending(answer);
+            this.setStatus('通信できないため端末に一時保存しました。接続が戻ると送信します');
+        });
+    }
+
+    // 一時保存した回答を、文章の全ての問題分まとめて1回で送信する
+    flushPending() {
+        const pending = this.readPending();
+        const answers = Object.values(pending);
+        if (answers.length === 0) return;
+
+        fetch('/api/submit-all-responses/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': this.getCsrfToken()
+            },
+            body: JSON.stringify({
+                text_id: this.textId,
+                answers: answers
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                this.removePending(data.question_ids.map(String));
+                this.setStatus('一時保存していた回答を送信しました');
+            }
+        })
+        .catch(error => {
+            console.error('一時保存した回答の送信エラー:', error);
+        });
+    }
+
+    readPending() {
+        try {
+            return JSON.parse(localStorage.getItem(this.pendingKey)) || {};
+        } catch (e) {
+            return {};
+        }
+    }
+
+    writePending(pending) {
+        try {
+            if (Object.keys(pending).length > 0) {
+                localStorage.setItem(this.pendingKey, JSON.stringify(pending));
+            } else {
+                localStorage.removeItem(this.pendingKey);
+            }
+        } catch (e) {
+            // localStorage が使えない環境では一時保存しない
+        }
+    }
+
+    storePending(answer) {
+        const pending = this.readPending();
+        pending[answer.question_id] = answer;
+        this.writePending(pending);
+    }
+
+    removePending(questionIds) {
+        const pending = this.readPending();
+        questionIds.forEach(id => delete pending[id]);
+        this.writePending(pending);
+    }
+
+    setStatus(message) {
+        if (this.status) this.status.textContent = message;
+    }
+
+    getCsrfToken() {
+        return document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
+    }
+}
+
+// ページ読み込み時に初期化
+document.addEventListener('DOMContentLoaded', () => {
+    const form = document.getElementById('answer-form');
+    if (form) {
+        new AnswerAutosave(form);
+    }
+});
@@ -0,0 +1,57 @@
+class ApiCache {
+    constructor() {
+        this.storageKeyPrefix = 'api-cache:';
+        this.entries = new Map();
+    }
+
+    // ETag を付けて再検証し、304 の場合は保持している応答をそのまま返す
+    fetchJson(url) {
+        const cached = this.get(url);
+        const headers = {};
+        if (cached) {
+            headers['If-None-Match'] = cached.etag;
+        }
+
+        return fetch(url, { headers: headers })
+            .then(response => {
+                if (response.status === 304 && cached) {
+                    return cached.data;
+                }
+                return response.json().then(data => {
+                    const etag = response.headers.get('ETag');
+                    if (etag && data.success) {
+                        this.set(url, { etag: etag, data: data });
+                    }
+                    return data;
+                });
+            });
+    }
+
+    get(url) {
+        if (this.entries.has(url)) {
+            return this.entries.get(url);
+        }
+        try {
+            const stored = sessionStorage.getItem(this.storageKeyPrefix + url);
+            if (stored) {
+                const entry = JSON.parse(stored);
+                this.entries.set(url, entry);
+                return entry;
+            }
+        } catch (e) {
+            // sessionStorage が使えない環境ではメモリ上のキャッシュのみ使う
+        }
+        return null;
+    }
+
+    set(url, entry) {
+        this.entries.set(url, entry);
+        try {
+            sessionStorage.setItem(this.storageKeyPrefix + url, JSON.stringify(entry));
+        } catch (e) {
+            // 容量超過などの場合はメモリ上のキャッシュのみ使う
+        }
+    }
+}
+
+window.apiCache = window.apiCache || new ApiCache();
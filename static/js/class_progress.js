@@ -0,0 +1,93 @@
+class ClassProgressBoard {
+    constructor(container) {
+        this.container = container;
+        this.url = container.dataset.url;
+        this.updatedAt = document.getElementById('progress-updated-at');
+        this.refreshInterval = 10000;
+        this.phaseLabels = {
+            reading: ['読解', 'bg-primary'],
+            answering: ['解答', 'bg-warning text-dark'],
+            completed: ['完了', 'bg-success']
+        };
+        this.init();
+    }
+
+    init() {
+        this.refresh();
+        setInterval(() => {
+            if (!document.hidden) this.refresh();
+        }, this.refreshInterval);
+    }
+
+    refresh() {
+        fetch(this.url, { credentials: 'same-origin' })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    this.render(data);
+                } else {
+                    console.error('進捗の取得に失敗しました:', data.error);
+                }
+            })
+            .catch(error => {
+                console.error('進捗の取得エラー:', error);
+            });
+    }
+
+    render(data) {
+        if (data.texts.length === 0) {
+            this.container.innerHTML = '<p>有効な文章がありません。</p>';
+            return;
+        }
+
+        // (生徒ID, 文章ID) → セル
+        const cells = new Map();
+        data.cells.forEach(cell => cells.set(`${cell.student_id}:${cell.text_id}`, cell));
+
+        const header = data.texts.map(text =>
+            `<th class="small">${this.escape(text.title)}<br><span class="text-muted">全${text.question_count}問</span></th>`
+        ).join('');
+        const rows = data.students.map(student => {
+            const columns = data.texts.map(text =>
+                this.renderCell(cells.get(`${student.id}:${text.id}`), text)
+            ).join('');
+            return `<tr><th class="small">${this.escape(student.username)}</th>${columns}</tr>`;
+        }).join('');
+
+        // 表は行数が多いため文字列から一度に組み立てる
+        this.container.innerHTML =
+            `<table class="table table-sm table-bordered"><thead><tr><th>生徒</th>${header}</tr></thead><tbody>${rows}</tbody></table>`;
+        if (this.updatedAt) {
+            this.updatedAt.textContent = `更新: ${new Date(data.generated_at).toLocaleTimeString('ja-JP')}`;
+        }
+    }
+
+    renderCell(cell, text) {
+        if (!cell) return '<td class="small text-muted">未開始</td>';
+
+        const [label, badgeClass] = this.phaseLabels[cell.phase] || [cell.phase, 'bg-secondary'];
+        const reading = cell.reading_seconds === null ? '未読' : `読解${Math.floor(cell.reading_seconds / 60)}分`;
+        const lastActivity = cell.last_activity_at
+            ? new Date(cell.last_activity_at).toLocaleTimeString('ja-JP', { hour: '2-digit', minute: '2-digit' })
+            : '-';
+        return `<td class="small">
+            <span class="badge ${badgeClass}">${label}</span>
+            ${cell.answered_count}/${text.question_count}問<br>
+            <span class="text-muted">${reading}・${lastActivity}</span>
+        </td>`;
+    }
+
+    escape(value) {
+        const div = document.createElement('div');
+        div.textContent = value;
+        return div.innerHTML;
+    }
+}
+
+// ページ読み込み時に初期化
+document.addEventListener('DOMContentLoaded', () => {
+    const container = document.getElementById('class-progress');
+    if (container) {
+        new ClassProgressBoard(container);
+    }
+});
@@ -0,0 +1,119 @@
+class HighlightHeatmap {
+    constructor() {
+        this.textId = document.querySelector('[data-text-id]')?.getAttribute('data-text-id');
+        this.heatmap = null;
+        this.visible = false;
+        this.overlay = null;
+        this.init();
+    }
+
+    init() {
+        if (!this.textId) return;
+        this.setupToggle();
+        window.addEventListener('resize', () => {
+            if (this.visible) this.render();
+        });
+    }
+
+    setupToggle() {
+        const rightColumn = document.querySelector('.col-md-4');
+        if (!rightColumn) return;
+
+        const card = document.createElement('div');
+        card.className = 'card mt-3';
+        card.innerHTML = `
+            <div class="card-header">
+                <h6>クラスのハイライト分布</h6>
+            </div>
+            <div class="card-body">
+                <button class="btn btn-outline-danger w-100 toggle-heatmap-btn">🔥 ハイライト分布を表示</button>
+                <small class="text-muted d-block mt-2 heatmap-summary"></small>
+            </div>
+        `;
+        rightColumn.insertBefore(card, rightColumn.firstChild);
+
+        card.querySelector('.toggle-heatmap-btn').addEventListener('click', (e) => {
+            this.visible = !this.visible;
+            e.target.textContent = this.visible ? '🔥 ハイライト分布を隠す' : '🔥 ハイライト分布を表示';
+            if (this.visible) {
+                this.load();
+            } else {
+                this.clear();
+            }
+        });
+    }
+
+    load() {
+        fetch(`/api/teacher/highlight-heatmap/${this.textId}/`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    this.heatmap = data.heatmap;
+                    document.querySelector('.heatmap-summary').textContent =
+                        `${data.heatmap.student_count}名・${data.heatmap.highlight_count}件（最大${data.heatmap.max}件重複）`;
+                    if (this.visible) this.render();
+                }
+            })
+            .catch(error => {
+                console.error('ハイライト分布読み込みエラー:', error);
+            });
+    }
+
+    clear() {
+        if (this.overlay) {
+            this.overlay.remove();
+            this.overlay = null;
+        }
+    }
+
+    render() {
+        this.clear();
+        const textContent = document.querySelector('.text-content');
+        if (!textContent || !this.heatmap || this.heatmap.max === 0) return;
+
+        // 本文のDOMを変更しないよう、上に重ねたレイヤーに矩形を描く
+        textContent.style.position = 'relative';
+        this.overlay = document.createElement('div');
+        this.overlay.className = 'highlight-heatmap-overlay';
+        this.overlay.style.cssText = 'position: absolute; top: 0; left: 0; width: 100%; height: 100%; pointer-events: none;';
+        textContent.appendChild(this.overlay);
+
+        const origin = textContent.getBoundingClientRect();
+        const fragment = document.createDocumentFragment();
+        this.createRanges(this.heatmap.segments).forEach(({ range, value }) => {
+            const alpha = 0.1 + 0.5 * (value / this.heatmap.max);
+            Array.from(range.getClientRects()).forEach(rect => {
+                const box = document.createElement('div');
+                box.style.cssText = `
+                    position: absolute;
+                    left: ${rect.left - origin.left}px;
+                    top: ${rect.top - origin.top}px;
+                    width: ${rect.width}px;
+                    height: ${rect.height}px;
+                    background-color: rgba(220, 53, 69, ${alpha});
+                `;
+                fragment.appendChild(box);
+            });
+        });
+        this.overlay.appendChild(fragment);
+    }
+
+    createRanges(segments) {
+        // 区間はテキストノードをまたぐことがあるため、ノードごとに分割する
+        const ranges = [];
+        for (const [start, end, value] of segments) {
+            window.textOffsetIndex.slices(start, end).forEach(slice => {
+                const range = document.createRange();
+                range.setStart(slice.node, slice.start);
+                range.setEnd(slice.node, slice.end);
+                ranges.push({ range, value });
+            });
+        }
+        return ranges;
+    }
+}
+
+// ページ読み込み時に初期化
+document.addEventListener('DOMContentLoaded', () => {
+    new HighlightHeatmap();
+});
@@ -13,14 +13,14 @@ class PhaseController {
     }
 
     loadCurrentSession() {
-        fetch(`/api/get-reading-session/${this.textId}/`)
-            .then(response => response.json())
+        window.textBootstrap.load(this.textId)
             .then(data => {
                 if (data.success) {
                     this.currentPhase = data.session.current_phase;
                     this.sessionId = data.session.id;
                     this.updatePhaseDisplay();
                     this.controlQuestionsVisibility();
+                    this.subscribePhaseEvents();
                 }
             })
             .catch(error => {
@@ -28,6 +28,35 @@ class PhaseController {
             });
     }
 
+    // 教員による一括のフェーズ変更をSSEで受け取る
+    subscribePhaseEvents() {
+        if (!window.EventSource || this.eventSource) return;
+
+        this.eventSource = new EventSource(`/api/text/${this.textId}/phase-events/`);
+        this.eventSource.addEventListener('phase', (e) => {
+            this.applyPhase(JSON.parse(e.data).phase);
+        });
+    }
+
+    applyPhase(phase) {
+        if (phase === this.currentPhase) return;
+
+        // 問題は解答フェーズのときだけサーバー側で描画されるため、表示されていなければ再読み込みする
+        if (phase === 'answering' && !this.findQuestionsCard()) {
+            window.location.reload();
+            return;
+        }
+
+        this.currentPhase = phase;
+        this.updatePhaseDisplay();
+        this.controlQuestionsVisibility();
+        if (phase === 'answering') {
+            this.controlTextVisibility();
+        } else {
+            this.showTextContent();
+        }
+    }
+
     setupPhaseControls() {
         // 読解完了ボタンの追加
         const phaseControl = document.createElement('div');
@@ -92,58 +121,58 @@ class PhaseController {
             return;
         }
 
-        fetch('/api/transition-to-answering/', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': this.getCsrfToken()
-            },
-            body: JSON.stringify({
-                text_id: this.textId
+        this.postTransition('/api/transition-to-answering/')
+            .then(data => {
+                if (data.success) {
+                    this.applyPhase(data.current_phase);
+                }
             })
-        })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                this.currentPhase = 'answering';
-                this.sessionId = data.session_id;
-                this.updatePhaseDisplay();
-                this.controlQuestionsVisibility();
-                this.controlTextVisibility();
-            }
-        })
-        .catch(error => {
-            console.error('フェーズ移行エラー:', error);
-            alert('フェーズの移行に失敗しました。');
-        });
+            .catch(error => {
+                console.error('フェーズ移行エラー:', error);
+                alert('フェーズの移行に失敗しました。');
+            });
     }
 
     transitionToReadingPhase() {
         if (!confirm('読解フェーズに戻りますか？')) return;
 
-        fetch('/api/transition-to-reading/', {
+        this.postTransition('/api/transition-to-reading/')
+            .then(data => {
+                if (data.success) {
+                    this.applyPhase(data.current_phase);
+                }
+            })
+            .catch(error => {
+                console.error('フェーズ移行エラー:', error);
+                alert('フェーズの移行に失敗しました。');
+            });
+    }
+
+    // 通信エラー時は同じ冪等キーで再送する（サーバー側で二重に移行されない）
+    postTransition(url, retries = 3) {
+        const idempotencyKey = window.crypto?.randomUUID
+            ? window.crypto.randomUUID()
+            : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+        const send = (attempt) => fetch(url, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': this.getCsrfToken()
             },
             body: JSON.stringify({
-                text_id: this.textId
+                text_id: this.textId,
+                idempotency_key: idempotencyKey
             })
         })
         .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                this.currentPhase = 'reading';
-                this.updatePhaseDisplay();
-                this.controlQuestionsVisibility();
-                this.showTextContent();
-            }
-        })
         .catch(error => {
-            console.error('フェーズ移行エラー:', error);
-            alert('フェーズの移行に失敗しました。');
+            if (attempt >= retries) throw error;
+            return new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt))
+                .then(() => send(attempt + 1));
         });
+
+        return send(0);
     }
 
     updatePhaseDisplay() {
@@ -246,8 +275,7 @@ class PhaseController {
     }
 
     showMemosModal() {
-        fetch(`/api/get-all-memos/${this.textId}/`)
-            .then(response => response.json())
+        window.apiCache.fetchJson(`/api/get-all-memos/${this.textId}/`)
             .then(data => {
                 if (data.success) {
                     this.displayMemosModal(data.memos);
@@ -0,0 +1,42 @@
+class TextBootstrap {
+    constructor() {
+        this.requests = new Map();
+    }
+
+    // 文章ページの初期データ（セッション・注釈・段落・分析コンテンツ）を返す
+    // ページに埋め込まれたデータがあればそれを使い、なければ一括取得APIを1回だけ呼ぶ
+    load(textId) {
+        const key = String(textId);
+        if (!this.requests.has(key)) {
+            this.requests.set(key, this.fetchData(key));
+        }
+        return this.requests.get(key);
+    }
+
+    fetchData(textId) {
+        const embedded = document.getElementById('text-bootstrap');
+        if (embedded) {
+            try {
+                const data = JSON.parse(embedded.textContent);
+                if (String(data.text_id) === textId) {
+                    return Promise.resolve(data);
+                }
+            } catch (e) {
+                console.error('初期データ読み込みエラー:', e);
+            }
+        }
+
+        return window.apiCache.fetchJson(`/api/text/${textId}/bootstrap/`)
+            .then(data => {
+                // 失敗した応答は記憶せず、次回に再取得する
+                if (!data.success) this.requests.delete(textId);
+                return data;
+            })
+            .catch(error => {
+                this.requests.delete(textId);
+                throw error;
+            });
+    }
+}
+
+window.textBootstrap = window.textBootstrap || new TextBootstrap();
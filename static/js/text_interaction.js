@@ -2,6 +2,7 @@ class TextInteraction {
     constructor() {
         this.selectedText = null;
         this.userParagraphs = [];
+        this.savedParagraphs = new Map(); // サーバーに保存済みの段落（番号 → 内容・範囲）
         this.paragraphMode = false;
         this.nextParagraphNumber = 1;
         this.textId = document.querySelector('[data-text-id]')?.getAttribute('data-text-id');
@@ -15,6 +16,11 @@ class TextInteraction {
             'rgba(199, 199, 199, 0.1)',  // 薄いグレー
             'rgba(83, 102, 255, 0.1)',   // 薄いインディゴ
         ];
+        // 活動ログの送信バッファ（一定間隔・一定件数・ページ離脱時にまとめて送信）
+        this.activityBuffer = [];
+        this.activityFlushInterval = 5000;
+        this.activityFlushSize = 20;
+        this.activityBufferLimit = 200;
         this.init();
     }
 
@@ -22,6 +28,7 @@ class TextInteraction {
         this.setupEventListeners();
         this.loadUserParagraphs();
         this.preventCopyPaste();
+        this.setupActivityBuffer();
         this.setupParagraphDisplay();
     }
 
@@ -309,9 +316,15 @@ class TextInteraction {
         const textContent = document.querySelector('.text-content');
         textContent.normalize();
 
-        // 全ての段落を再描画
-        this.userParagraphs.forEach(paragraph => {
-            this.visualizeParagraphByOffset(paragraph.startOffset, paragraph.endOffset, paragraph.number);
+        // 先に全ての範囲を同じ索引から作り、後ろの段落から囲む（前方の位置がずれないようにする）
+        const ranges = this.userParagraphs.map(paragraph => ({
+            range: this.createRangeFromOffsets(paragraph.startOffset, paragraph.endOffset),
+            number: paragraph.number
+        }));
+        ranges.reverse().forEach(({ range, number }) => {
+            if (range) {
+                this.visualizeParagraph(range, number);
+            }
         });
     }
 
@@ -330,46 +343,7 @@ class TextInteraction {
     }
 
     createRangeFromOffsets(startOffset, endOffset) {
-        const textContent = document.querySelector('.text-content');
-        const walker = document.createTreeWalker(
-            textContent,
-            NodeFilter.SHOW_TEXT,
-            null,
-            false
-        );
-
-        let currentOffset = 0;
-        let startNode = null;
-        let endNode = null;
-        let startNodeOffset = 0;
-        let endNodeOffset = 0;
-
-        while (walker.nextNode()) {
-            const node = walker.currentNode;
-            const nodeLength = node.textContent.length;
-            
-            if (currentOffset <= startOffset && currentOffset + nodeLength > startOffset) {
-                startNode = node;
-                startNodeOffset = startOffset - currentOffset;
-            }
-            
-            if (currentOffset <= endOffset && currentOffset + nodeLength >= endOffset) {
-                endNode = node;
-                endNodeOffset = endOffset - currentOffset;
-                break;
-            }
-            
-            currentOffset += nodeLength;
-        }
-
-        if (startNode && endNode) {
-            const range = document.createRange();
-            range.setStart(startNode, startNodeOffset);
-            range.setEnd(endNode, endNodeOffset);
-            return range;
-        }
-
-        return null;
+        return window.textOffsetIndex.createRange(startOffset, endOffset);
     }
 
     visualizeParagraph(range, paragraphNumber) {
@@ -486,11 +460,11 @@ class TextInteraction {
     loadUserParagraphs() {
         if (!this.textId) return;
 
-        fetch(`/api/get-paragraph-definitions/${this.textId}/`)
-            .then(response => response.json())
+        window.textBootstrap.load(this.textId)
             .then(data => {
                 if (data.success) {
                     this.userParagraphs = data.paragraphs;
+                    this.rememberSavedParagraphs(this.userParagraphs);
                     this.reassignParagraphNumbers();
                     this.updateParagraphDisplay();
                     this.refreshAllParagraphVisuals();
@@ -501,8 +475,33 @@ class TextInteraction {
             });
     }
 
+    rememberSavedParagraphs(paragraphs) {
+        paragraphs.forEach(p => {
+            this.savedParagraphs.set(p.number, {
+                content: p.content,
+                startOffset: p.startOffset,
+                endOffset: p.endOffset
+            });
+        });
+    }
+
+    getChangedParagraphs() {
+        return this.userParagraphs.filter(p => {
+            const saved = this.savedParagraphs.get(p.number);
+            return !saved ||
+                saved.content !== p.content ||
+                saved.startOffset !== p.startOffset ||
+                saved.endOffset !== p.endOffset;
+        });
+    }
+
     saveAllParagraphs() {
-        // 全ての段落を一括保存
+        // 保存済みの状態から変わった段落だけを送信（total を超える番号はサーバー側で削除）
+        const changedParagraphs = this.getChangedParagraphs();
+        const total = this.userParagraphs.length;
+        if (changedParagraphs.length === 0 && total === this.savedParagraphs.size) return;
+
+        const sentParagraphs = changedParagraphs.map(p => Object.assign({}, p));
         fetch('/api/save-all-paragraphs/', {
             method: 'POST',
             headers: {
@@ -511,12 +510,18 @@ class TextInteraction {
             },
             body: JSON.stringify({
                 text_id: this.textId,
-                paragraphs: this.userParagraphs
+                paragraphs: sentParagraphs,
+                total: total
             })
         })
         .then(response => response.json())
         .then(data => {
-            if (!data.success) {
+            if (data.success) {
+                this.savedParagraphs.forEach((_, number) => {
+                    if (number > total) this.savedParagraphs.delete(number);
+                });
+                this.rememberSavedParagraphs(sentParagraphs);
+            } else {
                 console.error('段落定義保存エラー:', data.error);
             }
         })
@@ -580,45 +585,80 @@ class TextInteraction {
     logActivity(activityType, details) {
         if (!this.textId) return;
         
-        fetch('/api/log-activity/', {
+        this.activityBuffer.push({
+            text_id: this.textId,
+            activity_type: activityType,
+            details: details
+        });
+
+        if (this.activityBuffer.length >= this.activityFlushSize) {
+            this.flushActivityBuffer();
+        }
+    }
+
+    setupActivityBuffer() {
+        // 一定間隔でバッファを送信
+        setInterval(() => {
+            this.flushActivityBuffer();
+        }, this.activityFlushInterval);
+
+        // ページ離脱時は sendBeacon で残りを送信
+        window.addEventListener('pagehide', () => {
+            this.flushActivityBuffer(true);
+        });
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.flushActivityBuffer(true);
+            }
+        });
+    }
+
+    flushActivityBuffer(useBeacon = false) {
+        if (this.activityBuffer.length === 0) return;
+
+        const events = this.activityBuffer.splice(0, this.activityBuffer.length);
+        const body = JSON.stringify({ events: events });
+
+        if (useBeacon && navigator.sendBeacon) {
+            const blob = new Blob([body], { type: 'application/json' });
+            if (navigator.sendBeacon('/api/log-activity-batch/', blob)) return;
+        }
+
+        fetch('/api/log-activity-batch/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': this.getCsrfToken()
             },
-            body: JSON.stringify({
-                text_id: this.textId,
-                activity_type: activityType,
-                details: details
-            })
+            body: body,
+            keepalive: useBeacon
+        })
+        .then(response => {
+            // サーバー側のキューが満杯（503）の場合は次回に再送する
+            if (response.status === 503) {
+                this.requeueActivityEvents(events);
+                return null;
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (data && !data.success) {
+                console.error('ログ送信エラー:', data.error);
+            }
         })
         .catch(error => {
             console.error('ログ送信エラー:', error);
+            this.requeueActivityEvents(events);
         });
     }
 
-    getTextOffset(node, offset) {
-        const textContent = document.querySelector('.text-content');
-        if (!textContent) return 0;
-
-        const walker = document.createTreeWalker(
-            textContent,
-            NodeFilter.SHOW_TEXT,
-            null,
-            false
-        );
-
-        let currentOffset = 0;
-        let currentNode;
-
-        while (currentNode = walker.nextNode()) {
-            if (currentNode === node) {
-                return currentOffset + offset;
-            }
-            currentOffset += currentNode.textContent.length;
-        }
+    requeueActivityEvents(events) {
+        // 送信に失敗したイベントを次回送信分の先頭に戻す（上限を超えた古いものは破棄）
+        this.activityBuffer = events.concat(this.activityBuffer).slice(-this.activityBufferLimit);
+    }
 
-        return currentOffset;
+    getTextOffset(node, offset) {
+        return window.textOffsetIndex.offsetOf(node, offset);
     }
 
     getCsrfToken() {
@@ -0,0 +1,198 @@
+class TextOffsetIndex {
+    constructor(selector) {
+        this.selector = selector;
+        this.root = null;
+        this.observer = null;
+        this.nodes = [];              // 本文のテキストノード（文書順）
+        this.starts = [];             // 各テキストノードの開始位置（累積長）
+        this.positions = new Map();   // テキストノード → nodes の添字
+        this.length = 0;
+        this.dirty = true;
+        this.bodyOffsetBase = undefined;
+    }
+
+    // 本文が差し替わった場合は監視し直す
+    attach() {
+        const root = document.querySelector(this.selector);
+        if (root === this.root) return;
+
+        if (this.observer) this.observer.disconnect();
+        this.root = root;
+        this.observer = null;
+        this.dirty = true;
+        this.bodyOffsetBase = undefined;
+        if (!root) return;
+
+        this.observer = new MutationObserver(() => {
+            this.dirty = true;
+        });
+        this.observer.observe(root, { childList: true, subtree: true, characterData: true });
+    }
+
+    isDirty() {
+        // 同じ処理の中で行った変更はまだ通知されていないため、未処理の記録も確認する
+        if (this.observer && this.observer.takeRecords().length > 0) {
+            this.dirty = true;
+        }
+        return this.dirty;
+    }
+
+    // DOMが変わっていれば索引を作り直す
+    ensure() {
+        this.attach();
+        if (!this.root) return false;
+        if (this.isDirty()) this.build();
+        return true;
+    }
+
+    build() {
+        this.nodes = [];
+        this.starts = [];
+        this.positions = new Map();
+
+        const walker = TextOffsetIndex.createTextWalker(this.root);
+        let offset = 0;
+        let node;
+        while (node = walker.nextNode()) {
+            const length = node.textContent.length;
+            if (length === 0) continue;
+            this.positions.set(node, this.nodes.length);
+            this.nodes.push(node);
+            this.starts.push(offset);
+            offset += length;
+        }
+        this.length = offset;
+        this.dirty = false;
+    }
+
+    // DOM上の位置（テキストノードとその中の位置）を本文の文字位置に変換する
+    offsetOf(node, offset) {
+        this.attach();
+        if (!this.root) return 0;
+
+        // 索引が古い場合、サーバーで付与した行の data-offset から作り直さずに求める
+        if (this.isDirty()) {
+            const lineOffset = this.lineOffsetOf(node, offset);
+            if (lineOffset !== null) return lineOffset;
+            this.build();
+        }
+
+        const index = this.positions.get(node);
+        return index !== undefined ? this.starts[index] + offset : this.length;
+    }
+
+    // 直前にある行の目印（空の .text-line 要素）まで文書順に遡り、その data-offset から位置を求める
+    lineOffsetOf(node, offset) {
+        if (node.nodeType !== Node.TEXT_NODE || !this.root.contains(node)) return null;
+
+        const walker = document.createTreeWalker(
+            this.root,
+            NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT,
+            {
+                acceptNode: current => current.nodeType === Node.TEXT_NODE
+                    && current.parentElement.closest('.paragraph-badge')
+                    ? NodeFilter.FILTER_REJECT
+                    : NodeFilter.FILTER_ACCEPT
+            },
+            false
+        );
+        walker.currentNode = node;
+        let position = offset;
+        let current;
+        while (current = walker.previousNode()) {
+            if (current.nodeType === Node.TEXT_NODE) {
+                position += current.textContent.length;
+            } else if (current.matches('.text-line[data-offset]')) {
+                return this.getBodyOffsetBase() + parseInt(current.dataset.offset, 10) + position;
+            }
+        }
+        return null;
+    }
+
+    // 本文の先頭（最初の data-offset 要素）より前にある空白の長さ
+    getBodyOffsetBase() {
+        if (this.bodyOffsetBase === undefined) {
+            let base = 0;
+            for (let node = this.root.querySelector('[data-offset]'); node && node !== this.root; node = node.parentNode) {
+                for (let sibling = node.previousSibling; sibling; sibling = sibling.previousSibling) {
+                    base += sibling.textContent.length;
+                }
+            }
+            this.bodyOffsetBase = base;
+        }
+        return this.bodyOffsetBase;
+    }
+
+    // position を含むテキストノードの添字を二分探索で求める
+    // （atEnd の場合は position で終わるノードを優先する）
+    findNode(position, atEnd = false) {
+        let low = 0;
+        let high = this.starts.length - 1;
+        let found = -1;
+        while (low <= high) {
+            const middle = (low + high) >> 1;
+            if (atEnd ? this.starts[middle] < position : this.starts[middle] <= position) {
+                found = middle;
+                low = middle + 1;
+            } else {
+                high = middle - 1;
+            }
+        }
+        return atEnd && position === 0 && this.nodes.length ? 0 : found;
+    }
+
+    // 文字位置の区間 [start, end) をテキストノードごとの区間に分割する
+    slices(start, end) {
+        if (!this.ensure() || start >= end) return [];
+
+        const slices = [];
+        for (let index = Math.max(this.findNode(start), 0); index < this.nodes.length; index++) {
+            const nodeStart = this.starts[index];
+            if (nodeStart >= end) break;
+            const nodeEnd = nodeStart + this.nodes[index].textContent.length;
+            if (nodeEnd <= start) continue;
+            slices.push({
+                node: this.nodes[index],
+                start: Math.max(start, nodeStart) - nodeStart,
+                end: Math.min(end, nodeEnd) - nodeStart
+            });
+        }
+        return slices;
+    }
+
+    createRange(startOffset, endOffset) {
+        if (!this.ensure()) return null;
+
+        const startIndex = this.findNode(startOffset);
+        const endIndex = this.findNode(endOffset, true);
+        if (startIndex < 0 || endIndex < 0) return null;
+
+        const startNode = this.nodes[startIndex];
+        const endNode = this.nodes[endIndex];
+        if (startOffset >= this.starts[startIndex] + startNode.textContent.length ||
+            endOffset > this.starts[endIndex] + endNode.textContent.length) {
+            return null;
+        }
+
+        const range = document.createRange();
+        range.setStart(startNode, startOffset - this.starts[startIndex]);
+        range.setEnd(endNode, endOffset - this.starts[endIndex]);
+        return range;
+    }
+
+    // 段落番号のバッジは本文ではないため、位置の計算から除外する
+    static createTextWalker(root) {
+        return document.createTreeWalker(
+            root,
+            NodeFilter.SHOW_TEXT,
+            {
+                acceptNode: node => node.parentElement.closest('.paragraph-badge')
+                    ? NodeFilter.FILTER_REJECT
+                    : NodeFilter.FILTER_ACCEPT
+            },
+            false
+        );
+    }
+}
+
+window.textOffsetIndex = window.textOffsetIndex || new TextOffsetIndex('.text-content');